@@ -0,0 +1,126 @@
+"""
+Match accuracy and lookup throughput of the local food database.
+
+    python benchmarks/bench_food_db.py [--seconds 2] [--min-accuracy 0.9]
+
+Each labelled meal lists the foods and grams a person would expect. An item
+counts as correct when the matched food is right and the grams are within
+10%. The run exits non-zero below ``--min-accuracy``.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from features.food_db import FoodDB  # noqa: E402
+
+GRAMS_TOLERANCE = 0.10
+
+# (meal text, [(food, grams), ...]) with foods in the order they are named;
+# None marks an item that should not resolve.
+CASES = [
+    ("two eggs, toast and a coffee", [("egg", 100), ("white bread", 30), ("coffee", 240)]),
+    ("150 g rice", [("white rice", 150)]),
+    ("rice (150g)", [("white rice", 150)]),
+    ("grilled chicken breast 200 g", [("chicken breast", 200)]),
+    ("salmon, brown rice and broccoli", [("salmon", 150), ("brown rice", 195), ("broccoli", 156)]),
+    ("greek yogurt with berries", [("greek yogurt", 170), ("berries", 145)]),
+    ("lentil soup and bread", [("lentil soup", 248), ("white bread", 30)]),
+    ("2 slices of whole wheat toast", [("whole wheat bread", 64)]),
+    ("half a cup of oats", [("rolled oats", 40.5)]),
+    ("1 1/2 cups of milk", [("milk", 366)]),
+    ("a large apple", [("apple", 236.6)]),
+    ("an apple", [("apple", 182)]),
+    ("bannana", [("banana", 118)]),
+    ("3 tbsp peanut butter", [("peanut butter", 48.4)]),
+    ("1 tsp honey", [("honey", 7.1)]),
+    ("a glass of orange juice", [("orange juice", 248)]),
+    ("2 scrambled eggs", [("scrambled eggs", 122)]),
+    ("330ml coke", [("soda", 341)]),
+    ("0.5 kg potatoes", [("potato", 500)]),
+    ("1,000 g rice", [("white rice", 1000)]),
+    ("1/0 cup of rice", [("white rice", 158)]),
+    ("8 oz steak", [("steak", 226.8)]),
+    ("chicken salad with olive oil dressing", [("chicken salad", 250), ("salad dressing", 30)]),
+    ("I had two eggs and toast for breakfast", [("egg", 100), ("white bread", 30)]),
+    ("a handful of almonds", [("almonds", 30)]),
+    ("2 cups of pasta", [("pasta", 280)]),
+    ("a bowl of oatmeal with blueberries", [("oatmeal", 234), ("blueberries", 148)]),
+    ("cheeseburger and fries", [("hamburger", 220), ("french fries", 117)]),
+    ("2 slices of pepperoni pizza", [("pepperoni pizza", 222)]),
+    ("tuna sandwich", [("tuna", 85), ("sandwich", 200)]),
+    ("avocado toast", [("avocado", 150), ("white bread", 30)]),
+    ("peanut butter toast", [("peanut butter", 16), ("white bread", 30)]),
+    ("2 slices of peanut butter toast", [("peanut butter", 32), ("white bread", 60)]),
+    ("salmon rice bowl", [("salmon", 150), ("white rice", 158)]),
+    ("spinach and feta omelette", [("spinach", 30), ("feta", 28), ("omelette", 120)]),
+    ("protein shake with a banana", [("protein powder", 30), ("banana", 118)]),
+    ("a latte", [("latte", 350)]),
+    ("tofu stir fry with vegetables", [("tofu", 126), ("stir fry", 300), ("mixed vegetables", 182)]),
+    ("a small bowl of quinoa", [("quinoa", 129.5)]),
+    ("some brocoli", [("broccoli", 156)]),
+    ("1 cup cottage cheese", [("cottage cheese", 226)]),
+    ("hummus with carrots", [("hummus", 30), ("carrot", 61)]),
+    ("dragonfruit sorbet", [(None, 0)]),
+    ("kombucha", [(None, 0)]),
+    # Partly known items go to Claude whole rather than counting one food.
+    ("chicken caesar wrap", [(None, 0)]),
+    ("fried chicken", [(None, 0)]),
+]
+
+
+def score(db):
+    correct = total = 0
+    misses = []
+    for text, expected in CASES:
+        items = db.estimate(text).items
+        for index, (food, grams) in enumerate(expected):
+            total += 1
+            item = items[index] if index < len(items) else None
+            matched = item.food if item else None
+            ok = matched == food and (
+                food is None or abs(item.grams - grams) <= grams * GRAMS_TOLERANCE
+            )
+            if ok:
+                correct += 1
+            else:
+                got = f"{matched} {item.grams:.0f} g" if item else "nothing"
+                misses.append(f"{text!r}: expected {food} {grams:.0f} g, got {got}")
+    return correct / total, misses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=2.0, help="time to spend on throughput")
+    parser.add_argument("--min-accuracy", type=float, default=0.9)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    db = FoodDB.load()
+    print(f"Loaded {len(db.names)} foods in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    accuracy, misses = score(db)
+    for miss in misses:
+        print(f"  miss: {miss}")
+    print(f"Item accuracy: {accuracy:.1%} ({len(CASES)} meals)")
+
+    texts = [text for text, _ in CASES]
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < args.seconds:
+        for text in texts:
+            db.estimate(text)
+        count += len(texts)
+    elapsed = time.perf_counter() - started
+    print(f"Throughput: {count / elapsed:,.0f} meals/s ({elapsed / count * 1e6:.1f} µs per meal)")
+
+    if accuracy < args.min_accuracy:
+        print(f"❌ Accuracy below {args.min_accuracy:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Throughput of the vectorised health metrics against the scalar functions.
+
+    python benchmarks/bench_health_metrics.py [--rows 1000000]
+
+Also checks that every bulk result matches the scalar calculation.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from features.bulk_metrics import compute_health_metrics  # noqa: E402
+from features.calculations import (  # noqa: E402
+    ACTIVITY_MULTIPLIERS,
+    calculate_bmi,
+    calculate_bmr,
+    calculate_tdee,
+    goal_calorie_range,
+    interpret_bmi,
+)
+
+GOALS = ["Lose weight", "Gain muscle", "Improve metabolic markers", "Maintain weight", ""]
+
+
+def make_profiles(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    half = rows // 2
+    # Form input is whole numbers; stored/imported data may carry decimals.
+    weight = np.concatenate(
+        [rng.integers(30, 201, half), rng.uniform(30, 200, rows - half).round(1)]
+    )
+    height = np.concatenate(
+        [rng.integers(100, 251, half), rng.uniform(100, 250, rows - half).round(1)]
+    )
+    return pd.DataFrame(
+        {
+            "weight": weight,
+            "height": height,
+            "age": rng.integers(10, 101, rows),
+            "gender": rng.choice(["Female", "Male", "Other"], rows),
+            "activity_level": rng.choice(list(ACTIVITY_MULTIPLIERS) + ["?"], rows),
+            "goal": rng.choice(GOALS, rows),
+        }
+    )
+
+
+def scalar_metrics(row):
+    bmi = calculate_bmi(row.weight, row.height)
+    bmr = calculate_bmr(row.weight, row.height, row.age, row.gender)
+    tdee = calculate_tdee(bmr, row.activity_level)
+    low, high = goal_calorie_range(tdee, row.goal)
+    return bmi, bmr, tdee, interpret_bmi(bmi), low, high
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--scalar-rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    profiles = make_profiles(args.rows)
+
+    started = time.perf_counter()
+    bulk = compute_health_metrics(profiles)
+    bulk_seconds = time.perf_counter() - started
+
+    sample = profiles.iloc[: args.scalar_rows]
+    started = time.perf_counter()
+    expected = [scalar_metrics(row) for row in sample.itertuples(index=False)]
+    scalar_seconds = time.perf_counter() - started
+
+    columns = ["bmi", "bmr", "tdee", "bmi_category", "goal_calories_low", "goal_calories_high"]
+    actual = list(bulk.iloc[: args.scalar_rows][columns].itertuples(index=False, name=None))
+    mismatches = sum(1 for a, e in zip(actual, expected) if a != e)
+
+    bulk_rate = args.rows / bulk_seconds
+    scalar_rate = args.scalar_rows / scalar_seconds
+    print(f"bulk:   {args.rows:>9,} rows in {bulk_seconds:.3f}s ({bulk_rate:,.0f} rows/s)")
+    print(f"scalar: {args.scalar_rows:>9,} rows in {scalar_seconds:.3f}s ({scalar_rate:,.0f} rows/s)")
+    print(f"speedup: {bulk_rate / scalar_rate:.0f}x, mismatches: {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
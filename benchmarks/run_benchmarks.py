@@ -0,0 +1,417 @@
+"""
+Micro-benchmarks for the app's hot paths, with AWS replaced by in-memory stubs.
+
+    python benchmarks/run_benchmarks.py [--filter pdf] [--output results.json]
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/<commit>.json
+
+Results are written as JSON (by default to benchmarks/results/<commit>.json).
+With ``--compare``, each benchmark's median is checked against an earlier
+results file, and the run exits non-zero if any is slower than ``--threshold``.
+"""
+
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from features import aws_clients, images, llm_claude  # noqa: E402
+from features.bulk_metrics import compute_health_metrics  # noqa: E402
+from features.calculations import (  # noqa: E402
+    calculate_bmi,
+    calculate_bmr,
+    calculate_tdee,
+    goal_calorie_range,
+    interpret_bmi,
+)
+from features import diet_analytics  # noqa: E402
+from features.diet_export import DietExporter  # noqa: E402
+from features.diet_tracking import fetch_diet_logs  # noqa: E402
+from features.downloads import _render_pdf, download_meal_plan_pdf  # noqa: E402
+from features.dynamo import clean_profile_data, convert_floats_to_decimal  # noqa: E402
+from features.food_db import get_food_db  # noqa: E402
+from features.llm_claude import invoke_claude  # noqa: E402
+from features.llm_scheduler import LLMScheduler  # noqa: E402
+from features.plan_index import PlanIndex  # noqa: E402
+
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+from bench_health_metrics import make_profiles  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Register a setup function that returns the callable to time."""
+
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+class StubBedrock:
+    def invoke_model(self, **kwargs):
+        body = {"content": [{"type": "text", "text": "ok"}], "usage": {}}
+        return {"body": io.BytesIO(json.dumps(body).encode("utf-8"))}
+
+
+class StubTable:
+    """Serves pre-sorted items in 1 MB-sized pages, like a DynamoDB Query."""
+
+    # The wellness-app table's key; the write buffer reads it.
+    key_schema = [
+        {"AttributeName": "user_id", "KeyType": "HASH"},
+        {"AttributeName": "log_id", "KeyType": "RANGE"},
+    ]
+
+    def __init__(self, items, page_size=1000):
+        self.items = items
+        self.page_size = page_size
+
+    def query(self, **kwargs):
+        start = kwargs.get("ExclusiveStartKey", {}).get("offset", 0)
+        end = start + self.page_size
+        response = {"Items": self.items[start:end]}
+        if end < len(self.items):
+            response["LastEvaluatedKey"] = {"offset": end}
+        return response
+
+
+class StubDynamoDB:
+    def __init__(self, table):
+        self.table = table
+
+    def Table(self, name):
+        return self.table
+
+
+def _photo(width=4032, height=3024):
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    # Smooth gradients plus noise compress like a real photo, unlike pure noise.
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    base = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1)
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    out = io.BytesIO()
+    Image.fromarray(pixels).save(out, format="JPEG", quality=92)
+    return out.getvalue()
+
+
+def _stub_bedrock():
+    """Stub Bedrock behind a scheduler with no rate limit, so the token bucket
+    doesn't add sleeps to what is timed."""
+    aws_clients.override("bedrock-runtime", client=StubBedrock())
+    llm_claude.scheduler = LLMScheduler(rate_per_minute=1e9, burst=1e9)
+
+
+@benchmark("claude_payload_large_image")
+def _claude_payload_uncached():
+    _stub_bedrock()
+    photo = _photo()
+
+    def run():
+        images._cache.clear()
+        invoke_claude("Describe this meal.", image=photo, use_cache=False)
+
+    return run
+
+
+@benchmark("claude_payload_large_image_cached")
+def _claude_payload_cached():
+    _stub_bedrock()
+    photo = _photo()
+    return lambda: invoke_claude("Describe this meal.", image=photo, use_cache=False)
+
+
+def _nested_profile(meals=2000):
+    rng = np.random.default_rng(1)
+    return {
+        "age": 34,
+        "weight": 71.5,
+        "height": 172.0,
+        "bmi": 24.17,
+        "goal": "Lose weight",
+        "empty": "",
+        "missing": None,
+        "history": [
+            {
+                "day": i,
+                "meals": [
+                    {"name": "meal", "calories": float(c), "macros": [float(m) for m in ms]}
+                    for c, ms in zip(rng.uniform(100, 900, 4), rng.uniform(0, 80, (4, 3)))
+                ],
+            }
+            for i in range(meals // 4)
+        ],
+    }
+
+
+@benchmark("convert_floats_to_decimal")
+def _convert_floats():
+    profile = _nested_profile()
+    return lambda: convert_floats_to_decimal(profile)
+
+
+@benchmark("clean_profile_data")
+def _clean_profile():
+    profile = _nested_profile()
+    return lambda: clean_profile_data(profile)
+
+
+@benchmark("fetch_diet_logs_10k")
+def _fetch_diet_logs():
+    start = datetime.date(2024, 1, 1)
+    items = []
+    for i in range(10_000):
+        date = str(start + datetime.timedelta(days=i // 8))
+        time_of_day = f"{6 + (i % 8) * 2:02d}:00"
+        items.append(
+            {
+                "user_id": "bench-user",
+                "log_id": f"log-{i}",
+                "date": date,
+                "time": time_of_day,
+                "date_time": f"{date}#{time_of_day}",
+                "meal": "Text",
+                "food": "oats with berries and a coffee",
+            }
+        )
+    aws_clients.override("dynamodb", resource=StubDynamoDB(StubTable(items)))
+    return lambda: fetch_diet_logs("bench-user")
+
+
+def _long_week_plan():
+    day = "\n".join(
+        f"**{meal}**: grilled chicken, quinoa and roasted vegetables (1 plate)\n"
+        f"- 540 kcal · protein 42 g · carbs 48 g · fat 16 g"
+        for meal in ("Breakfast", "Lunch", "Dinner", "Snack", "Snack")
+    )
+    return "\n\n".join(f"## Day {n}\n\n{day}\n\n_Day total: 2700 kcal_" for n in range(1, 8)) * 3
+
+
+@benchmark("meal_plan_pdf_render")
+def _pdf_uncached():
+    plan = _long_week_plan()
+    return lambda: _render_pdf(plan)
+
+
+@benchmark("meal_plan_pdf_download_cached")
+def _pdf_cached():
+    plan = _long_week_plan()
+    return lambda: download_meal_plan_pdf(plan)
+
+
+@benchmark("calculations_scalar_10k")
+def _calculations_scalar():
+    rows = list(make_profiles(10_000).itertuples(index=False))
+
+    def run():
+        for row in rows:
+            bmi = calculate_bmi(row.weight, row.height)
+            interpret_bmi(bmi)
+            tdee = calculate_tdee(calculate_bmr(row.weight, row.height, row.age, row.gender), row.activity_level)
+            goal_calorie_range(tdee, row.goal)
+
+    return run
+
+
+@benchmark("calculations_bulk_100k")
+def _calculations_bulk():
+    profiles = make_profiles(100_000)
+    return lambda: compute_health_metrics(profiles)
+
+
+@benchmark("food_db_estimate_meal")
+def _food_db_estimate():
+    db = get_food_db()
+    return lambda: db.estimate("two eggs, 2 slices of whole wheat toast and a latte")
+
+
+def _index_profiles(rows):
+    """Profiles that all share the hard filters: the worst case for one query."""
+    frame = make_profiles(rows, seed=1)
+    frame["body_fat"] = np.random.default_rng(1).integers(8, 45, rows)
+    frame["tdee"] = compute_health_metrics(frame)["tdee"]
+    frame["diet_type"] = "None"
+    frame["allergies"] = "Peanuts"
+    return frame.to_dict("records")
+
+
+@benchmark("plan_index_build_100k")
+def _plan_index_build():
+    profiles = _index_profiles(100_000)
+
+    def run():
+        index = PlanIndex(partition_size=len(profiles))
+        for profile in profiles:
+            index.add(profile, "1 Day", "", "plan")
+
+    return run
+
+
+@benchmark("plan_index_query_100k")
+def _plan_index_query():
+    profiles = _index_profiles(100_000)
+    index = PlanIndex(partition_size=len(profiles))
+    for profile in profiles:
+        index.add(profile, "1 Day", "", "plan")
+    return lambda: index.query(profiles[12345], "1 Day", "")
+
+
+def _diet_log_items(users, days, meals_per_day=4):
+    start = datetime.date(2020, 1, 1)
+    for user in range(users):
+        for day in range(days):
+            date = str(start + datetime.timedelta(days=day))
+            for meal in range(meals_per_day):
+                time_of_day = f"{7 + meal * 4:02d}:30"
+                yield {
+                    "user_id": f"user-{user}",
+                    "log_id": f"{user}-{day}-{meal}",
+                    "date": date,
+                    "time": time_of_day,
+                    "date_time": f"{date}#{time_of_day}",
+                    "meal": "Text",
+                    "food": "oats with berries and a coffee",
+                    "likes_dislikes": "",
+                    "calories": 450 + (day * 7 + meal * 13) % 200,
+                    "protein_g": 25,
+                    "carbs_g": 55,
+                    "fat_g": 15,
+                }
+
+
+@benchmark("diet_export_20k")
+def _diet_export():
+    items = list(_diet_log_items(users=10, days=500))
+
+    def run():
+        root = tempfile.mkdtemp()
+        try:
+            exporter = DietExporter(root)
+            exporter.begin()
+            for item in items:
+                exporter.add(item)
+            exporter.commit()
+        finally:
+            shutil.rmtree(root)
+
+    return run
+
+
+@benchmark("diet_analytics_5y_one_user")
+def _diet_analytics():
+    # 50 users x 5 years x 4 meals = 365k rows; queries read one user's files.
+    root = tempfile.mkdtemp()
+    exporter = DietExporter(root)
+    exporter.begin()
+    for item in _diet_log_items(users=50, days=5 * 365):
+        exporter.add(item)
+    exporter.commit()
+    dataset = diet_analytics.open_archive(root)
+
+    def run():
+        diet_analytics.intake_trend(dataset, "user-7", "week")
+        diet_analytics.intake_trend(dataset, "user-7", "month")
+        diet_analytics.tdee_adherence(dataset, "user-7", (1600, 2000))
+        diet_analytics.meal_timing(dataset, "user-7")
+
+    return run
+
+
+def measure(run, min_rounds, min_seconds):
+    run()  # warm-up
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < min_rounds or time.perf_counter() - started < min_seconds:
+        t0 = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - t0)
+    return {
+        "rounds": len(timings),
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+    print(f"\nvs {baseline.get('commit', baseline_path)}:")
+    for name, result in results["benchmarks"].items():
+        before = baseline["benchmarks"].get(name)
+        if not before:
+            continue
+        ratio = result["median"] / before["median"]
+        flag = "  ❌ slower" if ratio > threshold else ""
+        print(f"  {name:<36}{ratio:>7.2f}x{flag}")
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--filter", default="", help="only run benchmarks containing this text")
+    parser.add_argument("--rounds", type=int, default=5, help="minimum timed rounds")
+    parser.add_argument("--min-time", type=float, default=1.0, help="minimum seconds per benchmark")
+    parser.add_argument("--output", help="results file (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare medians against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio that fails --compare")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "benchmarks": {},
+    }
+    for name, setup in BENCHMARKS.items():
+        if args.filter not in name:
+            continue
+        result = measure(setup(), args.rounds, args.min_time)
+        results["benchmarks"][name] = result
+        print(f"{name:<36}{result['median'] * 1000:>10.2f} ms median ({result['rounds']} rounds)")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
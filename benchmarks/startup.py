@@ -0,0 +1,140 @@
+"""
+Cold-start benchmark for the Streamlit app.
+
+    python benchmarks/startup.py [--runs 5] [--max-first-paint-ms 1000]
+
+Each run starts a fresh interpreter with ``-X importtime`` and renders the
+default page of main.py once through Streamlit's AppTest. The report shows the
+median time to first paint, the packages that cost the most to import, and
+which deferred packages (AWS SDK, PDF rendering) the first paint loaded. The
+run exits non-zero if the median is over budget or a deferred package was
+imported before it was needed.
+
+Timed runs prewarm the AWS clients as in production, so the first paint
+competes with the background boto3 import. Credentials and endpoints are
+stubbed, so no AWS call is made. Deferred imports are checked in one extra
+run with prewarm off, where nothing else could have loaded them first.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only a page that uses these should import them.
+DEFERRED = ("boto3", "botocore", "fpdf")
+# Real-looking configuration that never reaches AWS.
+STUB_AWS_ENV = {
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "AWS_REGION": "us-east-1",
+    "AWS_ENDPOINT_URL": "http://127.0.0.1:9",
+    "AWS_EC2_METADATA_DISABLED": "true",
+}
+
+
+def child():
+    """Render main.py once and print timings as JSON (runs in the subprocess)."""
+    sys.path.insert(0, ROOT)
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+
+    framework = time.perf_counter() - started
+    before = set(sys.modules)
+    started = time.perf_counter()
+    app = AppTest.from_file(os.path.join(ROOT, "main.py"), default_timeout=60).run()
+    first_paint = time.perf_counter() - started
+    loaded = {name.partition(".")[0] for name in set(sys.modules) - before}
+    print(
+        json.dumps(
+            {
+                "framework": framework,
+                "first_paint": first_paint,
+                "errors": [str(e.value) for e in app.exception],
+                "deferred_loaded": sorted(loaded & set(DEFERRED)),
+            }
+        )
+    )
+
+
+def parse_importtime(stderr: str) -> dict:
+    """Self import time (seconds) per top-level package."""
+    totals = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        totals[name.strip().partition(".")[0]] += int(self_us) / 1e6
+    return totals
+
+
+def run_once(prewarm=True):
+    env = dict(
+        os.environ, **STUB_AWS_ENV, AWS_PREWARM=str(prewarm).lower(), METRICS_PORT="0"
+    )
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", __file__, "--child"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result["imports"] = parse_importtime(process.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to start")
+    parser.add_argument("--max-first-paint-ms", type=float, default=1000, help="budget for the median")
+    parser.add_argument("--top", type=int, default=10, help="slowest packages to list")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return
+
+    runs = [run_once() for _ in range(args.runs)]
+    # Prewarm imports boto3 in the background, which would hide a page that
+    # imports it eagerly; check deferred imports without it.
+    check = run_once(prewarm=False)
+    first_paint = statistics.median(r["first_paint"] for r in runs) * 1000
+    framework = statistics.median(r["framework"] for r in runs) * 1000
+    imports = defaultdict(list)
+    for r in runs:
+        for name, seconds in r["imports"].items():
+            imports[name].append(seconds)
+
+    print(f"{'streamlit test harness import':<36}{framework:>10.0f} ms median")
+    print(f"{'main.py first paint':<36}{first_paint:>10.0f} ms median ({args.runs} runs)")
+    print("\nSlowest imports (self time, median):")
+    slowest = sorted(imports.items(), key=lambda item: -statistics.median(item[1]))
+    for name, seconds in slowest[: args.top]:
+        print(f"  {name:<34}{statistics.median(seconds) * 1000:>10.1f} ms")
+
+    failures = []
+    errors = {e for r in runs + [check] for e in r["errors"]}
+    if errors:
+        failures.append(f"main.py raised: {'; '.join(sorted(errors))}")
+    deferred = check["deferred_loaded"]
+    if deferred:
+        failures.append(f"first paint imported {', '.join(deferred)}")
+    if first_paint > args.max_first_paint_ms:
+        failures.append(f"first paint {first_paint:.0f} ms > {args.max_first_paint_ms:.0f} ms")
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        sys.exit(1)
+    print("✅ Startup within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import contextlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+
+SAMPLE_RATE = 16000
+BYTES_PER_SAMPLE = 2  # signed 16-bit little-endian PCM
+CHUNK_SECONDS = float(os.getenv("AUDIO_CHUNK_SECONDS", "4"))
+COPY_BLOCK_BYTES = 1024 * 1024
+# "vosk" (the vosk package plus an unpacked model at VOSK_MODEL_PATH; the
+# Docker image ships both) or "stub", which only echoes STT_STUB_TEXT.
+STT_BACKEND = os.getenv("STT_BACKEND", "vosk")
+VOSK_MODEL_PATH = os.getenv("VOSK_MODEL_PATH", "models/vosk-model-small-en-us-0.15")
+
+
+class AudioDecodeError(RuntimeError):
+    """ffmpeg is missing or could not decode the upload."""
+
+
+class TranscriberUnavailable(RuntimeError):
+    """The configured speech-to-text backend cannot run here."""
+
+
+def decode_pcm_chunks(upload, suffix="", chunk_seconds=CHUNK_SECONDS):
+    """
+    Decode any ffmpeg-readable audio to 16 kHz mono PCM, one chunk at a time.
+
+    ``upload`` is a file-like object. It is copied to a temp file in fixed-size
+    blocks (m4a needs a seekable input), and ffmpeg's output is read in chunks
+    of ``chunk_seconds``, so memory use doesn't grow with recording length.
+    """
+    if shutil.which("ffmpeg") is None:
+        raise AudioDecodeError("ffmpeg is not installed")
+    chunk_bytes = int(SAMPLE_RATE * chunk_seconds) * BYTES_PER_SAMPLE
+
+    with contextlib.ExitStack() as stack:
+        source = stack.enter_context(tempfile.NamedTemporaryFile(suffix=suffix))
+        upload.seek(0)
+        shutil.copyfileobj(upload, source, COPY_BLOCK_BYTES)
+        source.flush()
+
+        # stderr goes to a file: a pipe that is only read at the end can fill
+        # up and stall ffmpeg while we wait on stdout.
+        errors_file = stack.enter_context(tempfile.TemporaryFile())
+        process = subprocess.Popen(
+            [
+                "ffmpeg", "-nostdin", "-loglevel", "error",
+                "-i", source.name,
+                "-f", "s16le", "-acodec", "pcm_s16le",
+                "-ac", "1", "-ar", str(SAMPLE_RATE),
+                "pipe:1",
+            ],
+            stdout=subprocess.PIPE,
+            stderr=errors_file,
+        )
+        try:
+            while True:
+                chunk = process.stdout.read(chunk_bytes)
+                if not chunk:
+                    break
+                yield chunk
+            if process.wait() != 0:
+                errors_file.seek(0)
+                errors = errors_file.read().decode("utf-8", "replace").strip()
+                raise AudioDecodeError(errors.splitlines()[-1] if errors else "decoding failed")
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+
+class StubTranscriber:
+    """
+    Deterministic stand-in for load tests and local runs (``STT_BACKEND=stub``).
+
+    Emits the configured text a word per chunk, so the UI still streams.
+    """
+
+    def __init__(self, text=None):
+        text = text or os.getenv("STT_STUB_TEXT", "two scrambled eggs with toast and coffee")
+        self._words = text.split()
+
+    def accept(self, pcm: bytes) -> str:
+        return self._words.pop(0) + " " if self._words else ""
+
+    def finish(self) -> str:
+        rest, self._words = " ".join(self._words), []
+        return rest
+
+
+class VoskTranscriber:
+    """Offline CPU recognition with Vosk; the model is loaded once per process."""
+
+    _model = None
+
+    def __init__(self):
+        from vosk import KaldiRecognizer, Model
+
+        if VoskTranscriber._model is None:
+            VoskTranscriber._model = Model(VOSK_MODEL_PATH)
+        self._recognizer = KaldiRecognizer(VoskTranscriber._model, SAMPLE_RATE)
+
+    def accept(self, pcm: bytes) -> str:
+        # Only completed utterances are emitted, so text is never revised.
+        if self._recognizer.AcceptWaveform(pcm):
+            text = json.loads(self._recognizer.Result()).get("text", "")
+            return text + " " if text else ""
+        return ""
+
+    def finish(self) -> str:
+        return json.loads(self._recognizer.FinalResult()).get("text", "")
+
+
+def get_transcriber(backend=STT_BACKEND):
+    """
+    Transcriber for ``backend``.
+
+    Never falls back to the stub: its fixed text would be logged as the
+    user's meal. Raises ``TranscriberUnavailable`` instead.
+    """
+    if backend == "stub":
+        return StubTranscriber()
+    if backend != "vosk":
+        raise TranscriberUnavailable(f"unknown STT_BACKEND {backend!r}")
+    if not os.path.isdir(VOSK_MODEL_PATH):
+        raise TranscriberUnavailable(f"Vosk model not found at {VOSK_MODEL_PATH!r}")
+    try:
+        return VoskTranscriber()
+    except ImportError:
+        raise TranscriberUnavailable("the vosk package is not installed") from None
+
+
+def transcribe_chunks(chunks, transcriber=None):
+    """Feed PCM chunks to a transcriber, yielding text as it becomes final."""
+    transcriber = transcriber or get_transcriber()
+    for chunk in chunks:
+        text = transcriber.accept(chunk)
+        if text:
+            yield text
+    text = transcriber.finish()
+    if text:
+        yield text
+
+
+def transcribe_upload(upload, suffix="", transcriber=None):
+    """
+    Stream the transcript of an uploaded recording, chunk by chunk.
+
+    The transcriber is created before anything is decoded, so a missing
+    backend raises ``TranscriberUnavailable`` here rather than mid-stream.
+    """
+    transcriber = transcriber or get_transcriber()
+    return transcribe_chunks(decode_pcm_chunks(upload, suffix), transcriber)
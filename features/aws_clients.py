@@ -0,0 +1,114 @@
+import os
+import threading
+
+from features.env_loader import load_env_variables
+from features.metrics import instrument_client
+
+# One boto3 session and one client per service for the whole process. Clients
+# are created on first use (not at import time) and shared by every Streamlit
+# session; botocore clients are thread-safe and pool their connections.
+# boto3 itself is imported on first use too, since it is slow to load.
+MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "25"))
+MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", "5"))
+# Bedrock calls are retried (and rate limited) by the LLM scheduler alone, so
+# botocore makes a single attempt; stacked retry layers multiply each other.
+SCHEDULER_OWNED_SERVICES = ("bedrock-runtime",)
+PREWARM = os.getenv("AWS_PREWARM", "true").lower() not in ("0", "false", "no")
+
+_lock = threading.Lock()
+_session = None
+_clients = {}
+_resources = {}
+
+
+def client_config(service_name: str = None):
+    from botocore.config import Config
+
+    if service_name in SCHEDULER_OWNED_SERVICES:
+        retries = {"mode": "standard", "max_attempts": 1}
+    else:
+        retries = {"mode": "adaptive", "max_attempts": MAX_ATTEMPTS}
+    return Config(
+        max_pool_connections=MAX_POOL_CONNECTIONS,
+        tcp_keepalive=True,
+        retries=retries,
+    )
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                import boto3
+
+                load_env_variables()
+                region = os.getenv("AWS_REGION") or "us-east-1"
+                _session = boto3.session.Session(region_name=region)
+    return _session
+
+
+def get_client(service_name: str):
+    client = _clients.get(service_name)
+    if client is None:
+        session = get_session()
+        with _lock:
+            client = _clients.get(service_name)
+            if client is None:
+                client = instrument_client(
+                    session.client(service_name, config=client_config(service_name))
+                )
+                _clients[service_name] = client
+    return client
+
+
+def get_resource(service_name: str):
+    resource = _resources.get(service_name)
+    if resource is None:
+        session = get_session()
+        with _lock:
+            resource = _resources.get(service_name)
+            if resource is None:
+                resource = session.resource(service_name, config=client_config(service_name))
+                instrument_client(resource.meta.client)
+                _resources[service_name] = resource
+    return resource
+
+
+def get_bedrock_client():
+    return get_client("bedrock-runtime")
+
+
+def get_dynamodb():
+    return get_resource("dynamodb")
+
+
+def get_table(name: str = "wellness-app"):
+    """
+    DynamoDB table handle backed by the shared resource.
+
+    Only stateless calls (put/get/query/scan/update) are made on it, which is
+    safe to share across threads.
+    """
+    return get_dynamodb().Table(name)
+
+
+def override(service_name: str, client=None, resource=None):
+    """Swap in a stub client/resource for a service (load tests, benchmarks)."""
+    with _lock:
+        if client is not None:
+            _clients[service_name] = client
+        if resource is not None:
+            _resources[service_name] = resource
+
+
+def prewarm():
+    """Create the app's clients on a background thread so the first click doesn't pay for it."""
+    if not PREWARM or (_clients.get("bedrock-runtime") and _resources.get("dynamodb")):
+        return
+
+    def _warm():
+        get_bedrock_client()
+        get_dynamodb()
+
+    threading.Thread(target=_warm, name="aws-prewarm", daemon=True).start()
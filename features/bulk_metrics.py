@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+from features.calculations import (
+    ACTIVITY_MULTIPLIERS,
+    DEFAULT_ACTIVITY_MULTIPLIER,
+    MAINTENANCE_FACTORS,
+    goal_calorie_factors,
+    interpret_bmi,
+)
+
+BMI_CATEGORY_SAMPLES = (10.0, 20.0, 27.0, 35.0)
+
+
+def _round_like_python(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """
+    ``np.round`` agreeing exactly with Python's ``round(x, ndigits)``.
+
+    NumPy scales before rounding, which can pick the other side of a decimal
+    tie that Python resolves exactly. Only values sitting on such a tie are
+    re-rounded one by one.
+    """
+    rounded = np.round(values, ndigits)
+    scaled = values * 10**ndigits
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for index in np.flatnonzero(near_tie):
+        rounded[index] = round(float(values[index]), ndigits)
+    return rounded
+
+
+def _as_frame(profiles) -> pd.DataFrame:
+    if isinstance(profiles, pd.DataFrame):
+        return profiles
+    return pd.DataFrame(profiles)
+
+
+def _per_value(column: pd.Series, func, dtype=float) -> np.ndarray:
+    """Apply ``func`` once per distinct value of a low-cardinality column."""
+    codes, uniques = pd.factorize(column, use_na_sentinel=False)
+    lookup = np.array([func(value) for value in uniques], dtype=dtype)
+    return lookup[codes]
+
+
+def _goal_factors(goal):
+    goal = goal if isinstance(goal, str) else ""
+    return goal_calorie_factors(goal)
+
+
+def compute_health_metrics(profiles) -> pd.DataFrame:
+    """
+    Vectorised BMI, BMR, TDEE, BMI category and goal calorie range.
+
+    ``profiles`` is a DataFrame (or dict of arrays) with ``weight`` (kg),
+    ``height`` (cm), ``age``, ``gender`` and ``activity_level`` columns, plus an
+    optional ``goal``. Results match the scalar functions in
+    ``features.calculations`` row for row.
+    """
+    df = _as_frame(profiles)
+    weight = df["weight"].to_numpy()
+    height = df["height"].to_numpy()
+    age = df["age"].to_numpy()
+
+    height_m = height / 100
+    bmi = _round_like_python(weight / (height_m**2), 2)
+
+    is_male = _per_value(df["gender"], lambda g: str(g).lower() == "male", bool)
+    bmr_base = 10 * weight + 6.25 * height - 5 * age
+    bmr = np.rint(np.where(is_male, bmr_base + 5, bmr_base - 161)).astype(np.int64)
+
+    multiplier = _per_value(
+        df["activity_level"],
+        lambda level: ACTIVITY_MULTIPLIERS.get(level, DEFAULT_ACTIVITY_MULTIPLIER),
+    )
+    tdee = np.rint(bmr * multiplier).astype(np.int64)
+
+    # Same branches, in the same order, as interpret_bmi.
+    category_code = np.select(
+        [bmi < 18.5, (18.5 <= bmi) & (bmi < 24.9), (25 <= bmi) & (bmi < 29.9)],
+        [0, 1, 2],
+        default=3,
+    )
+    bmi_category = pd.Categorical.from_codes(
+        category_code, [interpret_bmi(sample) for sample in BMI_CATEGORY_SAMPLES]
+    )
+
+    if "goal" in df:
+        factors = _per_value(df["goal"], _goal_factors, (float, 2))
+        low_factor, high_factor = factors[:, 0], factors[:, 1]
+    else:
+        low_factor, high_factor = MAINTENANCE_FACTORS
+
+    return pd.DataFrame(
+        {
+            "bmi": bmi,
+            "bmr": bmr,
+            "tdee": tdee,
+            "bmi_category": bmi_category,
+            "goal_calories_low": np.rint(tdee * low_factor).astype(np.int64),
+            "goal_calories_high": np.rint(tdee * high_factor).astype(np.int64),
+        },
+        index=df.index,
+    )
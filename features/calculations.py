@@ -1,3 +1,22 @@
+ACTIVITY_MULTIPLIERS = {
+    "Sedentary (little or no exercise)": 1.2,
+    "Lightly active (light exercise/sports 1–3 days/week)": 1.375,
+    "Moderately active (moderate exercise/sports 3–5 days/week)": 1.55,
+    "Very active (hard exercise/sports 6–7 days/week)": 1.725,
+    "Super active (very hard exercise/physical job)": 1.9,
+}
+DEFAULT_ACTIVITY_MULTIPLIER = 1.2
+
+# Daily calorie target as (low, high) fractions of TDEE, checked in this order
+# against the lower-cased goal text; anything else means maintenance.
+GOAL_CALORIE_FACTORS = [
+    ("lose weight", (0.75, 0.9)),
+    ("gain muscle", (1.1, 1.2)),
+    ("improve metabolic markers", (1.0, 1.0)),
+]
+MAINTENANCE_FACTORS = (1.0, 1.0)
+
+
 def calculate_bmi(weight_kg, height_cm):
     height_m = height_cm / 100
     return round(weight_kg / (height_m**2), 2)
@@ -11,14 +30,8 @@ def calculate_bmr(weight, height, age, gender):
 
 
 def calculate_tdee(bmr, activity_level):
-    multiplier = {
-        "Sedentary (little or no exercise)": 1.2,
-        "Lightly active (light exercise/sports 1–3 days/week)": 1.375,
-        "Moderately active (moderate exercise/sports 3–5 days/week)": 1.55,
-        "Very active (hard exercise/sports 6–7 days/week)": 1.725,
-        "Super active (very hard exercise/physical job)": 1.9,
-    }
-    return round(bmr * multiplier.get(activity_level, 1.2))
+    multiplier = ACTIVITY_MULTIPLIERS.get(activity_level, DEFAULT_ACTIVITY_MULTIPLIER)
+    return round(bmr * multiplier)
 
 
 def interpret_bmi(bmi):
@@ -30,3 +43,17 @@ def interpret_bmi(bmi):
         return "Overweight – slight calorie deficit and movement can help"
     else:
         return "Obese – focus on sustainable weight loss and whole foods"
+
+
+def goal_calorie_factors(goal):
+    goal_lower = (goal or "").lower()
+    for keyword, factors in GOAL_CALORIE_FACTORS:
+        if keyword in goal_lower:
+            return factors
+    return MAINTENANCE_FACTORS
+
+
+def goal_calorie_range(tdee, goal):
+    """Daily calorie target range (low, high) for the user's goal."""
+    low, high = goal_calorie_factors(goal)
+    return round(tdee * low), round(tdee * high)
@@ -0,0 +1,143 @@
+import datetime
+from urllib.parse import quote
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+
+from features.diet_export import ARCHIVE_PATH, PARTITIONING, open_filesystem
+from features.nutrition import MACROS
+
+PERIODS = ("week", "month")
+
+
+def open_archive(root=ARCHIVE_PATH):
+    """
+    The exported diet history as a pyarrow dataset.
+
+    Nothing is read here. Scans read only the requested columns of the
+    matching user/month directories, memory-mapped for local archives.
+    """
+    fs, path = open_filesystem(root)
+    return ds.dataset(
+        path,
+        filesystem=fs,
+        format="parquet",
+        partitioning=ds.partitioning(PARTITIONING, flavor="hive"),
+    )
+
+
+def has_history(user_id, root=ARCHIVE_PATH) -> bool:
+    fs, path = open_filesystem(root)
+    directory = f"{path}/user_id={quote(user_id, safe='')}"
+    return fs.get_file_info(directory).type == pafs.FileType.Directory
+
+
+def _user_filter(user_id, start_date=None, end_date=None):
+    """
+    Row filter for a user and inclusive ``YYYY-MM-DD`` (or date) bounds.
+
+    The month bounds let the scan skip whole directories.
+    """
+    condition = ds.field("user_id") == user_id
+    if start_date:
+        start = datetime.date.fromisoformat(str(start_date))
+        condition &= (ds.field("month") >= f"{start:%Y-%m}") & (ds.field("date") >= start)
+    if end_date:
+        end = datetime.date.fromisoformat(str(end_date))
+        condition &= (ds.field("month") <= f"{end:%Y-%m}") & (ds.field("date") <= end)
+    return condition
+
+
+def daily_totals(dataset, user_id, start_date=None, end_date=None) -> pa.Table:
+    """One row per logged day: date, meals and the summed macros, by date."""
+    table = dataset.to_table(
+        columns=["date", *MACROS], filter=_user_filter(user_id, start_date, end_date)
+    )
+    totals = table.group_by("date").aggregate(
+        [("date", "count")] + [(name, "sum") for name in MACROS]
+    )
+    totals = totals.rename_columns(
+        ["meals" if name == "date_count" else name.removesuffix("_sum") for name in totals.column_names]
+    )
+    return totals.sort_by("date")
+
+
+def intake_trend(dataset, user_id, period="week", start_date=None, end_date=None) -> pa.Table:
+    """
+    Average daily intake per week (starting Monday) or calendar month.
+
+    Days without any logs are left out of the averages rather than counted as
+    zero intake.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"period must be one of {PERIODS}")
+    daily = daily_totals(dataset, user_id, start_date, end_date)
+    daily = daily.append_column(period, pc.floor_temporal(daily["date"], unit=period))
+    trend = daily.group_by(period).aggregate(
+        [("date", "count"), ("meals", "sum")] + [(name, "mean") for name in MACROS]
+    )
+    trend = trend.rename_columns(
+        [
+            {"date_count": "days_logged", "meals_sum": "meals"}.get(name, name.removesuffix("_mean"))
+            for name in trend.column_names
+        ]
+    )
+    return trend.sort_by(period)
+
+
+def tdee_adherence(dataset, user_id, calorie_range, start_date=None, end_date=None) -> dict:
+    """
+    How often logged days landed in the target calorie range.
+
+    ``calorie_range`` is ``(low, high)``, usually ``goal_calorie_range(tdee, goal)``.
+    Returns day counts per band, the in-range share, mean calories and the
+    mean signed distance from the range (0 for days inside it).
+    """
+    low, high = calorie_range
+    # Days whose meals could not be estimated have no calorie total.
+    calories = pc.drop_null(daily_totals(dataset, user_id, start_date, end_date)["calories"])
+    days = len(calories)
+    if not days:
+        return {
+            "days": 0, "in_range": 0, "under": 0, "over": 0,
+            "share_in_range": None, "mean_calories": None, "mean_gap": None,
+        }
+    under = pc.less(calories, low)
+    over = pc.greater(calories, high)
+    gap = pc.if_else(under, pc.subtract(calories, low), pc.if_else(over, pc.subtract(calories, high), 0.0))
+    under_days = pc.sum(under).as_py() or 0
+    over_days = pc.sum(over).as_py() or 0
+    in_range = days - under_days - over_days
+    return {
+        "days": days,
+        "in_range": in_range,
+        "under": under_days,
+        "over": over_days,
+        "share_in_range": in_range / days,
+        "mean_calories": pc.mean(calories).as_py(),
+        "mean_gap": pc.mean(gap).as_py(),
+    }
+
+
+def meal_timing(dataset, user_id, start_date=None, end_date=None) -> dict:
+    """
+    When meals are eaten: meals and mean calories per hour of day, plus the
+    median time of each day's first and last meal (minutes after midnight).
+    """
+    table = dataset.to_table(
+        columns=["date", "minute_of_day", "calories"],
+        filter=_user_filter(user_id, start_date, end_date) & ds.field("minute_of_day").is_valid(),
+    )
+    table = table.append_column("hour", pc.divide(table["minute_of_day"], 60))
+    by_hour = table.group_by("hour").aggregate([("hour", "count"), ("calories", "mean")])
+    by_hour = by_hour.rename_columns(
+        [{"hour_count": "meals", "calories_mean": "calories"}.get(name, name) for name in by_hour.column_names]
+    ).sort_by("hour")
+    days = table.group_by("date").aggregate([("minute_of_day", "min"), ("minute_of_day", "max")])
+    return {
+        "by_hour": by_hour.select(["hour", "meals", "calories"]),
+        "first_meal": pc.approximate_median(days["minute_of_day_min"]).as_py(),
+        "last_meal": pc.approximate_median(days["minute_of_day_max"]).as_py(),
+    }
@@ -0,0 +1,270 @@
+import datetime
+import json
+import logging
+import os
+import time
+import uuid
+from urllib.parse import quote
+
+import pyarrow as pa
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+from boto3.dynamodb.conditions import Key
+
+from features.aws_clients import get_table
+from features.diet_tracking import DATE_INDEX
+from features.nutrition import MACROS
+
+logger = logging.getLogger(__name__)
+
+# Local directory or a URI pyarrow understands (e.g. s3://bucket/diet-archive).
+ARCHIVE_PATH = os.getenv("DIET_ARCHIVE_PATH", "diet_archive")
+# Rows buffered across all partitions before they are written out.
+FLUSH_ROWS = int(os.getenv("DIET_ARCHIVE_FLUSH_ROWS", "50000"))
+STATE_FILE = "_export_state.json"
+
+# Columns stored in each file; user_id and month come from the directory names
+# (user_id=<id>/month=YYYY-MM), as pyarrow.dataset's hive partitioning expects.
+SCHEMA = pa.schema(
+    [
+        ("log_id", pa.string()),
+        ("date", pa.date32()),
+        ("time", pa.string()),
+        ("date_time", pa.string()),
+        ("minute_of_day", pa.int16()),
+        ("meal", pa.string()),
+        ("food", pa.string()),
+        ("likes_dislikes", pa.string()),
+    ]
+    + [(name, pa.float32()) for name in MACROS]
+)
+PARTITIONING = pa.schema([("user_id", pa.string()), ("month", pa.string())])
+
+
+def open_filesystem(root=ARCHIVE_PATH):
+    """(filesystem, path) for the archive; local files are memory-mapped on read."""
+    if "://" in root:
+        return pafs.FileSystem.from_uri(root)
+    return pafs.LocalFileSystem(use_mmap=True), os.path.abspath(root)
+
+
+def _minute_of_day(date_time):
+    """Minutes after midnight from the ``date#HH:MM`` key, or None if unparsable."""
+    _, _, hhmm = date_time.partition("#")
+    try:
+        hours, minutes = hhmm.split(":")
+        return int(hours) * 60 + int(minutes)
+    except ValueError:
+        return None
+
+
+def _number(value):
+    return None if value is None else float(value)
+
+
+def query_pages(user_id, after=None):
+    """A user's log items through the date index, one page at a time, oldest first."""
+    condition = Key("user_id").eq(user_id)
+    if after:
+        condition &= Key("date_time").gte(after)
+    query = {"IndexName": DATE_INDEX, "KeyConditionExpression": condition}
+    table = get_table()
+    while True:
+        response = table.query(**query)
+        yield response.get("Items", [])
+        last_key = response.get("LastEvaluatedKey")
+        if not last_key:
+            return
+        query["ExclusiveStartKey"] = last_key
+
+
+def scan_pages():
+    """Every log item in the table, one page at a time, in no particular order."""
+    # The date index is sparse: only diet logs carry ``date_time``.
+    scan = {"IndexName": DATE_INDEX}
+    table = get_table()
+    while True:
+        response = table.scan(**scan)
+        yield response.get("Items", [])
+        last_key = response.get("LastEvaluatedKey")
+        if not last_key:
+            return
+        scan["ExclusiveStartKey"] = last_key
+
+
+class DietExporter:
+    """
+    Appends diet log items to a Parquet archive partitioned by user and month.
+
+    Each user has a watermark: the latest ``date_time`` exported and the
+    ``log_id``s at that key. A run only appends items past it, as new files,
+    so nothing already written is rewritten. Rows are flushed every
+    ``flush_rows`` to bound memory; watermarks are committed when the run
+    finishes, and files left by an interrupted run are deleted by the next.
+
+    Entries logged afterwards for an earlier date fall behind the watermark;
+    ``full=True`` rebuilds a user's (or the whole) archive to pick them up.
+    """
+
+    def __init__(self, root=ARCHIVE_PATH, flush_rows=FLUSH_ROWS):
+        self.fs, self.root = open_filesystem(root)
+        self.flush_rows = flush_rows
+        self.run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        # {"users": {user_id: {"date_time": str, "log_ids": [...]}}, "open_run": run_id}
+        self.state = self._load_state()
+        self._marks = {}  # watermarks reached by this run
+        self._buffers = {}  # (user_id, month) -> {column: [values]}
+        self._buffered = 0
+        self.rows_written = 0
+        self.files_written = 0
+        self.rows_skipped = 0  # logs with an unparsable date or macro
+
+    def _state_path(self):
+        return f"{self.root}/{STATE_FILE}"
+
+    def _load_state(self):
+        try:
+            with self.fs.open_input_stream(self._state_path()) as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return {"users": {}, "open_run": None}
+
+    def _save_state(self):
+        path = self._state_path()
+        self.fs.create_dir(self.root, recursive=True)
+        with self.fs.open_output_stream(f"{path}.tmp") as f:
+            f.write(json.dumps(self.state, sort_keys=True).encode())
+        self.fs.move(f"{path}.tmp", path)
+
+    def _partition_dir(self, user_id, month=None):
+        path = f"{self.root}/user_id={quote(user_id, safe='')}"
+        return path if month is None else f"{path}/month={month}"
+
+    def _exists(self, path):
+        return self.fs.get_file_info(path).type != pafs.FileType.NotFound
+
+    def begin(self):
+        """Remove files of an interrupted run and mark this one as open."""
+        stale = self.state.get("open_run")
+        if stale and self._exists(self.root):
+            selector = pafs.FileSelector(self.root, recursive=True)
+            prefix = f"part-{stale}-"
+            for info in self.fs.get_file_info(selector):
+                if info.is_file and info.base_name.startswith(prefix):
+                    self.fs.delete_file(info.path)
+            logger.warning("Removed files of interrupted diet export %s", stale)
+        self.state["open_run"] = self.run_id
+        self._save_state()
+
+    def add(self, item):
+        """Buffer one log item unless it is already in the archive."""
+        user_id, log_id = item.get("user_id"), item.get("log_id")
+        date_time, date = item.get("date_time"), item.get("date")
+        if not (user_id and log_id and date_time and date):
+            return
+        mark = self.state["users"].get(user_id)
+        if mark and (
+            date_time < mark["date_time"]
+            or (date_time == mark["date_time"] and log_id in mark["log_ids"])
+        ):
+            return
+        try:
+            day = datetime.date.fromisoformat(date)
+            macros = {name: _number(item.get(name)) for name in MACROS}
+        except (TypeError, ValueError):
+            # One bad log shouldn't abort the export; it is counted instead.
+            self.rows_skipped += 1
+            logger.warning("Skipped diet log %s of %s: bad date or macros", log_id, user_id)
+            return
+        columns = self._buffers.get((user_id, f"{day:%Y-%m}"))
+        if columns is None:
+            columns = self._buffers[(user_id, f"{day:%Y-%m}")] = {name: [] for name in SCHEMA.names}
+        columns["log_id"].append(log_id)
+        columns["date"].append(day)
+        columns["time"].append(item.get("time"))
+        columns["date_time"].append(date_time)
+        columns["minute_of_day"].append(_minute_of_day(date_time))
+        columns["meal"].append(item.get("meal"))
+        columns["food"].append(item.get("food"))
+        columns["likes_dislikes"].append(item.get("likes_dislikes"))
+        for name in MACROS:
+            columns[name].append(macros[name])
+
+        reached = self._marks.get(user_id)
+        if reached is None or date_time > reached["date_time"]:
+            self._marks[user_id] = {"date_time": date_time, "log_ids": [log_id]}
+        elif date_time == reached["date_time"]:
+            reached["log_ids"].append(log_id)
+        self._buffered += 1
+        if self._buffered >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        """Write buffered rows, one file per partition."""
+        for (user_id, month), columns in self._buffers.items():
+            directory = self._partition_dir(user_id, month)
+            self.fs.create_dir(directory, recursive=True)
+            table = pa.table(columns, schema=SCHEMA)
+            path = f"{directory}/part-{self.run_id}-{self.files_written:05d}.parquet"
+            pq.write_table(table, path, filesystem=self.fs, compression="zstd")
+            self.files_written += 1
+            self.rows_written += table.num_rows
+        self._buffers, self._buffered = {}, 0
+
+    def commit(self):
+        """Flush the rest and save the watermarks this run reached."""
+        self.flush()
+        users = self.state["users"]
+        for user_id, mark in self._marks.items():
+            previous = users.get(user_id)
+            if previous and previous["date_time"] == mark["date_time"]:
+                mark["log_ids"] = sorted(set(previous["log_ids"]) | set(mark["log_ids"]))
+            users[user_id] = mark
+        self.state["open_run"] = None
+        self._save_state()
+        self._marks = {}
+
+    def reset(self, user_id=None):
+        """Delete one user's files and watermark, or the whole archive."""
+        if user_id is None:
+            if self._exists(self.root):
+                self.fs.delete_dir_contents(self.root)
+            self.state = {"users": {}, "open_run": None}
+        else:
+            if self._exists(self._partition_dir(user_id)):
+                self.fs.delete_dir(self._partition_dir(user_id))
+            self.state["users"].pop(user_id, None)
+        self._save_state()
+
+    def export_user(self, user_id, full=False):
+        if full:
+            self.reset(user_id)
+        self.begin()
+        mark = self.state["users"].get(user_id)
+        for page in query_pages(user_id, mark["date_time"] if mark else None):
+            for item in page:
+                self.add(item)
+        self.commit()
+
+    def export_all(self, full=False):
+        if full:
+            self.reset()
+        self.begin()
+        for page in scan_pages():
+            for item in page:
+                self.add(item)
+        self.commit()
+
+
+def export_diet_history(user_id=None, root=ARCHIVE_PATH, full=False):
+    """Append new logs for one user (or every user) to the archive; returns the exporter."""
+    exporter = DietExporter(root)
+    if user_id is None:
+        exporter.export_all(full=full)
+    else:
+        exporter.export_user(user_id, full=full)
+    logger.info(
+        "Exported %d diet logs in %d files to %s (%d skipped)",
+        exporter.rows_written, exporter.files_written, exporter.root, exporter.rows_skipped,
+    )
+    return exporter
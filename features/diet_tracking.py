@@ -1,49 +1,228 @@
 import streamlit as st
+import bisect
 import datetime
+import threading
+import time as clock
 import uuid
+from collections import OrderedDict
 
 # import base64
-import boto3
 import os
-
-from features.llm_claude import call_claude
-
-# from decimal import Decimal
-from features.env_loader import load_env_variables
-
-# from dotenv import load_dotenv
-
-
-# Load environment variables from .env
-load_env_variables()
-
-# Get AWS region from env
-region = os.getenv("AWS_REGION") or "us-east-1"
-
-# Initialize DynamoDB resource with region
-dynamodb = boto3.resource("dynamodb", region_name=region)
-table = dynamodb.Table("wellness-app")
-
-
-def save_diet_entry(user_id, date, time, input_type, food_description, feedback=None):
+from boto3.dynamodb.conditions import Key
+
+from features.aws_clients import get_table
+from features.write_buffer import get_write_buffer
+from features.audio import AudioDecodeError, TranscriberUnavailable, transcribe_upload
+from features.llm_claude import PRIORITY_BATCH, stream_claude
+from features.metrics import span
+from features.dynamo import convert_floats_to_decimal
+from features.calculations import goal_calorie_range
+from features.nutrition import (
+    MACROS,
+    cached_commentary,
+    commentary_prompt,
+    day_period,
+    extract_macros,
+    get_daily_trend,
+    get_totals,
+    record_entry,
+    save_commentary,
+    totals_from_logs,
+    week_period,
+)
+
+# GSI with partition key ``user_id`` and sort key ``date_time`` ("YYYY-MM-DD#HH:MM").
+# Create it and backfill old items with scripts/backfill_diet_log_index.py.
+DATE_INDEX = os.getenv("DIET_LOG_DATE_INDEX", "user_id-date_time-index")
+DEFAULT_HISTORY_DAYS = 30
+# Logs already read for a user, indexed by date, so reruns of the page don't
+# query DynamoDB again. Entries logged in this process are added in place;
+# the TTL bounds how long writes from other processes can go unseen.
+LOG_CACHE_USERS = int(os.getenv("DIET_LOG_CACHE_USERS", "512"))
+LOG_CACHE_TTL = float(os.getenv("DIET_LOG_CACHE_TTL", "300"))
+
+_log_cache = OrderedDict()  # user_id -> (start, end, loaded_at, {date: [logs]})
+_log_cache_lock = threading.Lock()
+
+
+def make_date_time_key(date, time):
+    """Sortable ``date#time`` key, with the time normalised to 24-hour HH:MM."""
+    try:
+        time = datetime.datetime.strptime(time.strip(), "%I:%M %p").strftime("%H:%M")
+    except ValueError:
+        pass
+    return f"{date}#{time}"
+
+
+def save_diet_entry(
+    user_id, date, time, input_type, food_description, feedback=None, sync=False
+):
+    """
+    Log a meal and fold its estimated macros into the day/week aggregates.
+
+    Macros are extracted once here, so totals and trends never need the LLM.
+    The aggregates are updated by the write buffer once the log item is
+    stored, so they never count a meal that wasn't saved.
+    """
+    # Image descriptions are Claude's prose, not a list of foods.
+    macros = extract_macros(food_description, use_food_db=input_type != "Image")
     log_id = str(uuid.uuid4())
     item = {
         "user_id": user_id,
         "log_id": log_id,
         "date": date,
         "time": time,
+        "date_time": make_date_time_key(date, time),
         "meal": input_type,
         "food": food_description,
         "likes_dislikes": feedback or "",
     }
-    table.put_item(Item=item)
+    item.update(convert_floats_to_decimal(macros))
+    get_write_buffer().put(
+        item,
+        sync=sync,
+        on_written=lambda written: record_entry(user_id, date, macros, log_id),
+    )
+    _cache_diet_entry(item)
+    return item
+
+
+def _cache_diet_entry(item):
+    with _log_cache_lock:
+        cached = _log_cache.get(item["user_id"])
+        if cached is None:
+            return
+        start, end, _, by_date = cached
+        if start <= item["date"] <= end:
+            bisect.insort(
+                by_date.setdefault(item["date"], []),
+                item,
+                key=lambda log: log.get("date_time", ""),
+            )
 
 
-def fetch_diet_logs(user_id):
-    response = table.scan(
-        FilterExpression=boto3.dynamodb.conditions.Attr("user_id").eq(user_id)
+def fetch_diet_logs(user_id, start_date=None, end_date=None):
+    """
+    Query a user's logs through the date index, oldest first.
+
+    ``start_date``/``end_date`` are inclusive ``YYYY-MM-DD`` strings; either can
+    be omitted for an open-ended range. All result pages are read, and entries
+    still waiting in the write buffer are included.
+    """
+    condition = Key("user_id").eq(user_id)
+    # "~" sorts after every time suffix, so "<end>#~" covers the whole end day.
+    if start_date and end_date:
+        condition &= Key("date_time").between(f"{start_date}#", f"{end_date}#~")
+    elif start_date:
+        condition &= Key("date_time").gte(f"{start_date}#")
+    elif end_date:
+        condition &= Key("date_time").lte(f"{end_date}#~")
+
+    table = get_table()
+    query = {"IndexName": DATE_INDEX, "KeyConditionExpression": condition}
+    items = []
+    while True:
+        response = table.query(**query)
+        items.extend(response.get("Items", []))
+        last_key = response.get("LastEvaluatedKey")
+        if not last_key:
+            break
+        query["ExclusiveStartKey"] = last_key
+
+    stored_ids = {item.get("log_id") for item in items}
+    unwritten = get_write_buffer().pending(
+        lambda item: item.get("user_id") == user_id
+        and "date_time" in item
+        and item["log_id"] not in stored_ids
+        and (not start_date or item["date"] >= start_date)
+        and (not end_date or item["date"] <= end_date)
     )
-    return response.get("Items", [])
+    if unwritten:
+        items = sorted(items + unwritten, key=lambda item: item.get("date_time", ""))
+    return items
+
+
+def get_logs_by_date(user_id, start_date, end_date):
+    """
+    A user's logs between two inclusive dates as ``{date: [logs by time]}``.
+
+    Served from the process cache when an earlier read covered the range and
+    is younger than ``DIET_LOG_CACHE_TTL``; otherwise read with
+    ``fetch_diet_logs`` and cached.
+    """
+    with _log_cache_lock:
+        cached = _log_cache.get(user_id)
+        if cached is not None:
+            start, end, loaded_at, by_date = cached
+            if (
+                start <= start_date
+                and end_date <= end
+                and clock.monotonic() - loaded_at < LOG_CACHE_TTL
+            ):
+                _log_cache.move_to_end(user_id)
+                return {
+                    date: list(logs)
+                    for date, logs in by_date.items()
+                    if start_date <= date <= end_date
+                }
+
+    loaded_at = clock.monotonic()
+    by_date = {}
+    for log in fetch_diet_logs(user_id, start_date, end_date):
+        if "date" in log:
+            by_date.setdefault(log["date"], []).append(log)
+    with _log_cache_lock:
+        _log_cache[user_id] = (start_date, end_date, loaded_at, by_date)
+        _log_cache.move_to_end(user_id)
+        while len(_log_cache) > LOG_CACHE_USERS:
+            _log_cache.popitem(last=False)
+    return {date: list(logs) for date, logs in by_date.items()}
+
+
+def invalidate_diet_logs(user_id):
+    with _log_cache_lock:
+        _log_cache.pop(user_id, None)
+
+
+def _minutes_label(minutes):
+    return f"{int(minutes) // 60:02d}:{int(minutes) % 60:02d}"
+
+
+def _long_term_trends(user_id, profile):
+    """Trends over the exported history (scripts/export_diet_history.py), if any."""
+    # Imported here so pyarrow stays off the app's startup path.
+    from features import diet_analytics
+
+    if not diet_analytics.has_history(user_id):
+        return
+    with st.expander("📈 Long-term trends"):
+        dataset = diet_analytics.open_archive()
+        period = st.radio(
+            "Average daily intake per", diet_analytics.PERIODS, horizontal=True
+        )
+        trend = diet_analytics.intake_trend(dataset, user_id, period).to_pandas()
+        st.line_chart(trend, x=period, y=list(MACROS))
+
+        if profile.get("tdee"):
+            low, high = goal_calorie_range(float(profile["tdee"]), profile.get("goal", ""))
+            adherence = diet_analytics.tdee_adherence(dataset, user_id, (low, high))
+            if adherence["days"]:
+                st.metric(
+                    f"Days within {low}–{high} kcal",
+                    f"{adherence['share_in_range']:.0%}",
+                )
+                st.caption(
+                    f"{adherence['under']} under · {adherence['over']} over · "
+                    f"{adherence['days']} days logged"
+                )
+
+        timing = diet_analytics.meal_timing(dataset, user_id)
+        if timing["by_hour"].num_rows:
+            st.bar_chart(timing["by_hour"].to_pandas(), x="hour", y="meals")
+            st.caption(
+                f"Typical first meal {_minutes_label(timing['first_meal'])}, "
+                f"last meal {_minutes_label(timing['last_meal'])}"
+            )
 
 
 def diet_tracking_page():
@@ -77,22 +256,42 @@ def diet_tracking_page():
         )
         if uploaded_image:
             image_bytes = uploaded_image.read()
-            with st.spinner("🔍 Analyzing image to describe the meal..."):
-                prompt = "Describe the food content and estimate calories/macros from this image of a meal."
-                food_description = call_claude(prompt, image=image_bytes)
-                st.markdown(f"**Detected meal (Claude):** {food_description}")
+            prompt = "Describe the food content and estimate calories/macros from this image of a meal."
+            st.markdown("**Detected meal (Claude):**")
+            food_description = st.write_stream(stream_claude(prompt, image=image_bytes))
 
     elif input_type == "Audio":
         uploaded_audio = st.file_uploader(
             "Upload audio description", type=["mp3", "wav", "m4a"]
         )
         if uploaded_audio:
-            audio_bytes = uploaded_audio.read()
-            with st.spinner("🔍 Transcribing audio to describe the meal..."):
-                prompt = "Transcribe and summarize the food mentioned in the audio, with calorie/macro estimates."
-                # Assuming audio handling is future work; for now use base64 or fallback
-                food_description = call_claude(prompt)
-                st.markdown(f"**Detected meal (Claude):** {food_description}")
+            # Transcripts are kept per upload so reruns don't decode it again.
+            transcripts = st.session_state.setdefault("audio_transcripts", {})
+            food_description = transcripts.get(uploaded_audio.file_id, "")
+            st.markdown("**Transcript:**")
+            if food_description:
+                st.write(food_description)
+            else:
+                suffix = os.path.splitext(uploaded_audio.name)[1]
+                try:
+                    with span("audio.transcribe"):
+                        food_description = st.write_stream(
+                            transcribe_upload(uploaded_audio, suffix)
+                        ).strip()
+                except AudioDecodeError as exc:
+                    st.error(f"Could not read this recording: {exc}")
+                except TranscriberUnavailable as exc:
+                    st.error(f"Speech recognition is not available: {exc}")
+                transcripts[uploaded_audio.file_id] = food_description
+            if food_description:
+                # Only the transcript goes to Claude; logging reuses this estimate.
+                macros = extract_macros(food_description)
+                if macros:
+                    st.caption(
+                        f"Estimated: {macros['calories']:.0f} kcal · "
+                        f"protein {macros['protein_g']:.0f} g · "
+                        f"carbs {macros['carbs_g']:.0f} g · fat {macros['fat_g']:.0f} g"
+                    )
 
     feedback = st.text_input("Likes/Dislikes about the meal (optional)")
 
@@ -100,26 +299,37 @@ def diet_tracking_page():
         if not food_description:
             st.warning("Please enter or upload your meal.")
         else:
-            save_diet_entry(
-                user_id, str(date), meal_time, input_type, food_description, feedback
-            )
+            with st.spinner("Estimating calories and macros..."):
+                save_diet_entry(
+                    user_id, str(date), meal_time, input_type, food_description, feedback
+                )
             st.success("✅ Meal logged!")
 
-    st.subheader("🗕️ View Logged Meals")
-    logs = fetch_diet_logs(user_id)
+    _long_term_trends(user_id, profile)
 
-    if not logs:
-        st.info("No meals logged yet.")
+    st.subheader("🗕️ View Logged Meals")
+    today = datetime.date.today()
+    date_range = st.date_input(
+        "Show meals between",
+        value=(today - datetime.timedelta(days=DEFAULT_HISTORY_DAYS), today),
+    )
+    if not isinstance(date_range, (list, tuple)):
+        date_range = (date_range,)
+    start_date = date_range[0]
+    end_date = date_range[1] if len(date_range) > 1 else start_date
+    logs_by_date = get_logs_by_date(user_id, str(start_date), str(end_date))
+
+    if not logs_by_date:
+        st.info("No meals logged in this period.")
         return
 
-    date_options = sorted(
-        set(log.get("date", "") for log in logs if "date" in log), reverse=True
-    )
+    date_options = sorted(logs_by_date, reverse=True)
 
     selected_date = st.selectbox("Choose a date", date_options)
 
-    day_logs = [log for log in logs if log.get("date") == selected_date]
-    for log in sorted(day_logs, key=lambda x: x.get("time", "")):
+    # Each day's logs are kept ordered by date_time.
+    day_logs = logs_by_date[selected_date]
+    for log in day_logs:
         time_str = log.get("time", "[Unknown time]")
         meal_type = log.get("meal", "[Unknown type]")
         st.markdown(f"**{time_str}** — {meal_type}")
@@ -127,18 +337,59 @@ def diet_tracking_page():
         if log.get("likes_dislikes"):
             st.markdown(f"_Feedback_: {log['likes_dislikes']}")
 
-    if st.button("🧐 Summarize This Day’s Meals"):
-        summary_prompt = "\n".join(
-            f"Time: {log.get('time', '[Unknown time]')} — {log.get('food', '[Image/Audio Upload]')}"
-            for log in day_logs
+    st.subheader("📊 Nutrition Totals")
+    # Meals whose aggregate update hasn't run yet are added on top.
+    unrecorded = get_write_buffer().pending(
+        lambda item: item.get("user_id") == user_id and "date_time" in item
+    )
+    day_totals = get_totals(user_id, day_period(selected_date))
+    if not day_totals or not day_totals["entry_count"]:
+        # Days logged before aggregates were kept have no totals item.
+        day_totals = totals_from_logs(day_logs, day_totals)
+    else:
+        day_totals = totals_from_logs(
+            [item for item in unrecorded if item["date"] == selected_date], day_totals
+        )
+    week = week_period(selected_date)
+    week_totals = get_totals(user_id, week)
+    week_unrecorded = [item for item in unrecorded if week_period(item["date"]) == week]
+    if week_totals or week_unrecorded:
+        week_totals = totals_from_logs(week_unrecorded, week_totals)
+    for label, totals in (("Day", day_totals), ("Week", week_totals)):
+        if not totals:
+            continue
+        st.markdown(f"**{label}** · {totals['entry_count']} meals")
+        columns = st.columns(len(MACROS))
+        for column, name in zip(columns, MACROS):
+            unit = "kcal" if name == "calories" else "g"
+            label_text = name.replace("_g", "").capitalize()
+            column.metric(label_text, f"{round(totals[name])} {unit}")
+        if totals["unestimated"]:
+            st.caption(f"{totals['unestimated']} meal(s) could not be estimated.")
+
+    trend = get_daily_trend(user_id, str(start_date), str(end_date))
+    if len(trend) > 1:
+        st.line_chart(
+            {name: [trend[day][name] for day in sorted(trend)] for name in MACROS}
         )
-        summary_prompt += "\n\nSummarize total calories, macros, and meal patterns."
 
-        with st.spinner("Analyzing with Claude..."):
-            summary = call_claude(summary_prompt)
-            st.success("📜 Daily Summary")
-            st.write(summary)
+    if not day_totals:
+        return
+
+    commentary = cached_commentary(day_totals)
+    if commentary:
+        st.success("📜 Daily Summary")
+        st.markdown(commentary)
+    elif st.button("🧐 Summarize This Day’s Meals"):
+        st.success("📜 Daily Summary")
+        commentary = st.write_stream(
+            stream_claude(
+                commentary_prompt(selected_date, day_logs, day_totals),
+                priority=PRIORITY_BATCH,
+            )
+        )
+        save_commentary(user_id, selected_date, commentary, day_totals["entry_count"])
 
-        if st.button("🔁 Do you want to adjust your daily meal plan?"):
-            st.session_state["diet_summary"] = summary
-            st.switch_page("main.py")
+    if commentary and st.button("🔁 Do you want to adjust your daily meal plan?"):
+        st.session_state["diet_summary"] = commentary
+        st.switch_page("main.py")
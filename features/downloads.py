@@ -1,20 +1,134 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import zipfile
+from collections import OrderedDict
 from io import BytesIO
-from fpdf import FPDF
+
+from features.metrics import span
+
+# Any Unicode TTF works; DejaVu ships with the Docker image (fonts-dejavu-core).
+FONT_PATH = os.getenv("PDF_FONT_PATH", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+PDF_CACHE_SIZE = 32
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+# Used only when no TTF font is available and the core (Latin-1) font is used.
+_LATIN1_REPLACEMENTS = str.maketrans(
+    {"–": "-", "—": "-", "‘": "'", "’": "'", "“": '"', "”": '"', "•": "-", "…": "..."}
+)
+# fpdf 1.7 can only embed Basic Multilingual Plane glyphs (no emoji).
+_OUTSIDE_BMP = re.compile("[\U00010000-\U0010ffff]")
+
+_pdf_cache = OrderedDict()
+_pdf_cache_lock = threading.Lock()
 
 
 def download_meal_plan_txt(text, filename="meal_plan.txt"):
     return BytesIO(text.encode("utf-8"))
 
 
-def download_meal_plan_pdf(text, filename="meal_plan.pdf"):
+def _new_pdf():
+    # fpdf is only loaded once a PDF is actually rendered.
+    from fpdf import FPDF
+
     pdf = FPDF()
-    pdf.add_page()
     pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.set_font("Arial", size=12)
+    if os.path.exists(FONT_PATH):
+        pdf.add_font("DejaVu", "", FONT_PATH, uni=True)
+        pdf.set_font("DejaVu", size=12)
+    else:
+        pdf.set_font("Arial", size=12)
+    return pdf
+
+
+def _pdf_text(pdf, text):
+    text = _OUTSIDE_BMP.sub("", text)
+    if pdf.unifontsubset:
+        return text
+    text = text.translate(_LATIN1_REPLACEMENTS)
+    return text.encode("latin-1", "replace").decode("latin-1")
+
+
+def _write_plan(pdf, text, title=None):
+    pdf.add_page()
+    if title:
+        pdf.set_font_size(16)
+        pdf.multi_cell(0, 10, _pdf_text(pdf, title))
+        pdf.set_font_size(12)
+    # One multi_cell per paragraph rather than per line keeps the number of
+    # layout calls down on long weekly plans.
+    for paragraph in _pdf_text(pdf, text).split("\n\n"):
+        pdf.multi_cell(0, 8, paragraph)
+        pdf.ln(2)
+
+
+def _pdf_bytes(pdf):
+    return pdf.output(dest="S").encode("latin-1")
+
+
+def _render_pdf(text):
+    with span("pdf.render", kind="plan") as attributes:
+        pdf = _new_pdf()
+        _write_plan(pdf, text)
+        data = _pdf_bytes(pdf)
+        attributes["bytes"] = len(data)
+    return data
+
+
+def render_meal_plan_pdf(text):
+    """PDF bytes for one plan, cached by content hash."""
+    key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    with _pdf_cache_lock:
+        if key in _pdf_cache:
+            _pdf_cache.move_to_end(key)
+            return _pdf_cache[key]
+
+    data = _render_pdf(text)
+
+    with _pdf_cache_lock:
+        _pdf_cache[key] = data
+        while len(_pdf_cache) > PDF_CACHE_SIZE:
+            _pdf_cache.popitem(last=False)
+    return data
+
+
+def download_meal_plan_pdf(text, filename="meal_plan.pdf"):
+    return BytesIO(render_meal_plan_pdf(text))
+
+
+def export_plans_pdf(plans):
+    """
+    One PDF with a section per plan.
+
+    ``plans`` is an iterable of ``(title, text)``; it is consumed lazily, so a
+    generator over stored plans never has all plan texts in memory at once.
+    """
+    with span("pdf.render", kind="bundle") as attributes:
+        pdf = _new_pdf()
+        for title, text in plans:
+            _write_plan(pdf, text, title)
+        data = _pdf_bytes(pdf)
+        attributes["bytes"] = len(data)
+    return data
+
 
-    for line in text.split("\n"):
-        pdf.multi_cell(0, 10, line)
+def export_plans_zip(plans, fmt="pdf"):
+    """
+    ZIP archive with one file per plan, written to a spooled temp file.
 
-    # Output PDF as string and convert to BytesIO
-    pdf_bytes = pdf.output(dest="S").encode("latin-1")
-    return BytesIO(pdf_bytes)
+    ``plans`` is an iterable of ``(name, text)``. Each plan is rendered and
+    compressed straight into the archive, which spills to disk past 8 MB.
+    Returns the file object rewound to the start.
+    """
+    archive = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, text in plans:
+            safe_name = re.sub(r"[^\w.-]+", "_", name).strip("_") or "meal_plan"
+            if fmt == "pdf":
+                zf.writestr(f"{safe_name}.pdf", _render_pdf(text))
+            else:
+                zf.writestr(f"{safe_name}.txt", text.encode("utf-8"))
+    archive.seek(0)
+    return archive
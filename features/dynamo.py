@@ -1,20 +1,10 @@
 import uuid
-import boto3
-import os
 from decimal import Decimal
-from features.env_loader import load_env_variables
+from features.write_buffer import get_write_buffer
 
-# from dotenv import load_dotenv
-
-# Load environment variables from .env
-load_env_variables()
-
-# Get AWS region from env
-region = os.getenv("AWS_REGION") or "us-east-1"
-
-# Initialize DynamoDB resource with region
-dynamodb = boto3.resource("dynamodb", region_name=region)
-table = dynamodb.Table("wellness-app")
+# Profiles share the wellness-app table with diet logs (partition key user_id,
+# sort key log_id); this fixed sort key keeps a profile apart from its logs.
+PROFILE_LOG_ID = "profile"
 
 
 def convert_floats_to_decimal(obj):
@@ -35,12 +25,13 @@ def clean_profile_data(profile: dict) -> dict:
     return convert_floats_to_decimal(profile)
 
 
-def save_profile_to_dynamodb(profile: dict) -> str:
-
+def save_profile_to_dynamodb(profile: dict, sync: bool = False) -> str:
+    """Queue the profile for a batched write; ``sync=True`` writes it before returning."""
     user_id = str(uuid.uuid4())
     profile["user_id"] = user_id
 
     clean_profile = clean_profile_data(profile)
-    table.put_item(Item=clean_profile)
+    clean_profile["log_id"] = PROFILE_LOG_ID
+    get_write_buffer().put(clean_profile, sync=sync)
 
     return user_id
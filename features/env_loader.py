@@ -3,7 +3,15 @@ from dotenv import load_dotenv
 import os
 
 
+_loaded = False
+
+
 def load_env_variables():
+    """Load .env once per process and warn about missing AWS settings."""
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
     load_dotenv()  # Looks for .env in the root directory
 
     # Optional logging for debugging (remove in production)
@@ -0,0 +1,329 @@
+import csv
+import difflib
+import logging
+import os
+import re
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from fractions import Fraction
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FOODS_CSV = os.getenv("FOOD_DB_PATH", os.path.join(ROOT, "data", "foods.csv"))
+# The numeric table is converted once to .npy and memory-mapped from there.
+FOODS_NPY = os.getenv(
+    "FOOD_DB_CACHE", os.path.join(tempfile.gettempdir(), "wellness-foods.npy")
+)
+
+# Per-100 g values, then grams per piece/serving and per cup (0 if unknown).
+COLUMNS = ("kcal", "protein_g", "carbs_g", "fat_g", "unit_g", "cup_g")
+MACRO_COLUMNS = {"calories": 0, "protein_g": 1, "carbs_g": 2, "fat_g": 3}
+UNIT_G, CUP_G = 4, 5
+DEFAULT_CUP_G = 240.0
+FUZZY_CUTOFF = 0.8
+
+_WEIGHTS = {"g": 1.0, "kg": 1000.0, "oz": 28.35, "lb": 453.6}
+_UNITS = {
+    **{u: "g" for u in ("g", "gr", "gram", "grams")},
+    **{u: "kg" for u in ("kg", "kilo", "kilos", "kilogram", "kilograms")},
+    **{u: "oz" for u in ("oz", "ounce", "ounces")},
+    **{u: "lb" for u in ("lb", "lbs", "pound", "pounds")},
+    **{u: "ml" for u in ("ml", "milliliter", "milliliters", "millilitre", "millilitres")},
+    **{u: "l" for u in ("l", "liter", "liters", "litre", "litres")},
+    **{u: "cup" for u in ("cup", "cups", "mug", "mugs")},
+    **{u: "tbsp" for u in ("tbsp", "tablespoon", "tablespoons", "tbs")},
+    **{u: "tsp" for u in ("tsp", "teaspoon", "teaspoons")},
+    **{u: "handful" for u in ("handful", "handfuls")},
+    # Anything else counted in pieces or servings uses the food's unit_g.
+    **{
+        u: "unit"
+        for u in (
+            "slice", "slices", "piece", "pieces", "pc", "pcs", "bowl", "bowls",
+            "plate", "plates", "glass", "glasses", "serving", "servings",
+            "portion", "portions", "scoop", "scoops", "bar", "bars", "can",
+            "cans", "bottle", "bottles", "fillet", "fillets",
+        )
+    },
+}
+_NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "twelve": 12,
+    "half": 0.5, "a half": 0.5, "a couple": 2, "couple": 2, "a few": 3, "few": 3,
+    "some": 1,
+}
+_SIZES = {"small": 0.7, "medium": 1.0, "large": 1.3, "big": 1.3, "huge": 1.6}
+_FILLER = {
+    "a", "an", "of", "the", "my", "fresh", "cooked", "plain", "homemade", "some",
+    "i", "for", "breakfast", "lunch", "dinner", "snack", "today", "then",
+}
+# Spoken/typed lead-ins before the quantity: "I had two eggs".
+_LEAD_IN = re.compile(r"^\s*(?:(?:i|we)\s+)?(?:just\s+)?(?:had|ate|drank|have|having)\b", re.IGNORECASE)
+
+# Commas between digits are thousands separators or decimals ("1,000 g").
+_ITEM_SPLIT = re.compile(r"(?<!\d),|,(?!\d)|;|\+|\n|\band\b|\bwith\b|\bplus\b", re.IGNORECASE)
+_QUANTITY = re.compile(
+    r"^\s*(?P<qty>\d+\s+\d+/\d+|\d+/\d+|\d+(?:[.,]\d+)?|(?:"
+    + "|".join(sorted(_NUMBER_WORDS, key=len, reverse=True))
+    + r")\b)?(?:\s+of)?(?:\s+an?\b)?\s*(?P<unit>[a-z]+\b)?",
+    re.IGNORECASE,
+)
+# "chicken breast 200 g", "rice (150g)"
+_TRAILING = re.compile(r"\(?\s*(?P<qty>\d+(?:[.,]\d+)?)\s*(?P<unit>[a-z]+)\s*\)?\s*$", re.IGNORECASE)
+_TOKEN = re.compile(r"[a-z0-9%]+")
+
+
+def singular(token: str) -> str:
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith("oes"):
+        return token[:-2]
+    if token.endswith("s") and not token.endswith(("ss", "us")) and len(token) > 3:
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> tuple:
+    return tuple(singular(t) for t in _TOKEN.findall(text.lower()) if t not in _FILLER)
+
+
+# Words that may be left over once an item's foods are matched: preparation
+# that barely changes the macros, and serving words ("salmon rice bowl").
+# Anything else unmatched (e.g. "caesar" in "chicken caesar wrap") means the
+# item is not fully understood, and it goes to Claude instead.
+_MODIFIERS = {
+    singular(word)
+    for word in (
+        "grilled", "baked", "boiled", "steamed", "roasted", "toasted", "poached",
+        "raw", "sliced", "chopped", "diced", "shredded", "organic", "warm", "hot",
+        "cold", "iced", "leftover", "side", "whole", "lean", "small", "medium",
+        "large", "big", "huge", *_UNITS,
+    )
+}
+
+
+@dataclass
+class FoodItem:
+    text: str
+    grams: float
+    food: Optional[str] = None
+    row: Optional[int] = None
+
+
+@dataclass
+class FoodEstimate:
+    """Macros for the resolved items, plus the items that weren't found."""
+
+    macros: dict = field(default_factory=dict)
+    items: List[FoodItem] = field(default_factory=list)
+    unresolved: List[str] = field(default_factory=list)
+
+
+def _parse_quantity(value: str) -> Optional[float]:
+    """Number in "2", "1 1/2", "0,5", "1,000" or "two"; None if unusable ("1/0")."""
+    value = value.lower()
+    if value in _NUMBER_WORDS:
+        return float(_NUMBER_WORDS[value])
+    value = re.sub(r",(?=\d{3}\b)", "", value).replace(",", ".")
+    try:
+        return float(sum(Fraction(part) for part in value.split()))
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+class FoodDB:
+    """
+    Local food-composition table with a token index for name lookups.
+
+    The numbers live in a float32 array (one row per food, ``COLUMNS``);
+    names and aliases map to rows through an inverted token index, with
+    difflib correcting misspelled tokens.
+    """
+
+    def __init__(self, names, aliases, table):
+        self.names = names
+        # A plain ndarray view of the memmap: same pages, cheaper indexing.
+        self.table = np.asarray(table)
+        self._phrases = {}  # token tuple -> row
+        self._index = {}  # token -> {token tuple}
+        for row, phrases in enumerate(aliases):
+            for phrase in phrases:
+                tokens = tokenize(phrase)
+                if tokens and tokens not in self._phrases:
+                    self._phrases[tokens] = row
+                    for token in tokens:
+                        self._index.setdefault(token, set()).add(tokens)
+        self._vocabulary = sorted(self._index)
+
+    @classmethod
+    def load(cls, csv_path=FOODS_CSV, npy_path=FOODS_NPY):
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        names = [row["name"] for row in rows]
+        aliases = [[row["name"]] + [a for a in row["aliases"].split("|") if a] for row in rows]
+        try:
+            stale = (
+                not os.path.exists(npy_path)
+                or os.path.getmtime(npy_path) < os.path.getmtime(csv_path)
+            )
+            if stale:
+                table = np.array([[float(row[c]) for c in COLUMNS] for row in rows], dtype=np.float32)
+                np.save(npy_path, table)
+            table = np.load(npy_path, mmap_mode="r")
+            if table.shape != (len(rows), len(COLUMNS)):
+                raise ValueError(f"{npy_path} does not match {csv_path}")
+        except (OSError, ValueError):
+            logger.warning("Food table cache unavailable; keeping it in memory", exc_info=True)
+            table = np.array([[float(row[c]) for c in COLUMNS] for row in rows], dtype=np.float32)
+        return cls(names, aliases, table)
+
+    def _best_phrase(self, tokens):
+        """Longest known phrase fully contained in ``tokens``, or None."""
+        present = set(tokens)
+        position = {token: i for i, token in enumerate(tokens)}
+        best, best_key = None, None
+        for token in present:
+            for phrase in self._index.get(token, ()):
+                if not present.issuperset(phrase):
+                    continue
+                # Longer phrases win ("brown rice" over "rice"), then the one
+                # leaving fewer query words unexplained, then the later one,
+                # since the head noun comes last ("tuna sandwich").
+                key = (
+                    len(phrase),
+                    -len(present - set(phrase)),
+                    max(position[t] for t in phrase),
+                )
+                if best_key is None or key > best_key:
+                    best, best_key = phrase, key
+        return best
+
+    def _correct(self, tokens):
+        """Replace unknown tokens with the closest known one, if close enough."""
+        corrected = []
+        for token in tokens:
+            if token not in self._index and token not in _MODIFIERS:
+                close = difflib.get_close_matches(token, self._vocabulary, n=1, cutoff=FUZZY_CUTOFF)
+                token = close[0] if close else token
+            corrected.append(token)
+        return corrected
+
+    def match(self, text: str) -> Optional[List[int]]:
+        """
+        Rows of the foods named in ``text``, in the order they appear.
+
+        Several foods can share one item ("peanut butter toast"). Returns None
+        unless every word is part of a known food or a harmless modifier, so
+        a partly understood item is never counted as resolved.
+        """
+        tokens = self._correct(tokenize(text))
+        remaining = list(tokens)
+        phrases = []
+        while remaining:
+            phrase = self._best_phrase(remaining)
+            if phrase is None:
+                break
+            phrases.append(phrase)
+            for token in phrase:
+                remaining.remove(token)
+        if not phrases or any(token not in _MODIFIERS for token in remaining):
+            return None
+        phrases.sort(key=lambda phrase: max(tokens.index(t) for t in phrase))
+        return [self._phrases[phrase] for phrase in phrases]
+
+    def _grams(self, row, quantity, unit):
+        unit_g, cup_g = float(self.table[row, UNIT_G]), float(self.table[row, CUP_G])
+        cup_g = cup_g or DEFAULT_CUP_G
+        quantity = 1.0 if quantity is None else quantity
+        if unit in _WEIGHTS:
+            return quantity * _WEIGHTS[unit]
+        if unit == "ml":
+            return quantity * cup_g / 240
+        if unit == "l":
+            return quantity * 1000 * cup_g / 240
+        if unit == "cup":
+            return quantity * cup_g
+        if unit == "tbsp":
+            return quantity * cup_g / 16
+        if unit == "tsp":
+            return quantity * cup_g / 48
+        if unit == "handful":
+            return quantity * 30
+        return quantity * (unit_g or 100)
+
+    def parse_item(self, text: str) -> List[FoodItem]:
+        """
+        Foods and grams in one item such as "2 eggs", "150 g rice" or
+        "peanut butter toast"; a single food-less item if it doesn't resolve.
+
+        The quantity applies to the last food, the head noun ("2 slices of
+        peanut butter toast"); the others get one portion per counted piece.
+        """
+        text = text.strip()
+        rest = _LEAD_IN.sub("", text)
+        found = _QUANTITY.match(rest)
+        quantity = _parse_quantity(found["qty"]) if found["qty"] else None
+        unit = _UNITS.get((found["unit"] or "").lower())
+        if unit:
+            rest = rest[found.end("unit"):]
+        elif found["qty"]:
+            rest = rest[found.end("qty"):]
+        trailing = _TRAILING.search(rest) if not found["qty"] and unit is None else None
+        if trailing and trailing["unit"].lower() in _UNITS:
+            quantity = _parse_quantity(trailing["qty"])
+            unit = _UNITS[trailing["unit"].lower()]
+            rest = rest[: trailing.start()]
+        words = rest.split()
+        scale = 1.0
+        while words and words[0].lower() in _SIZES:
+            scale *= _SIZES[words.pop(0).lower()]
+        rows = self.match(" ".join(words))
+        if rows is None:
+            return [FoodItem(text, 0.0)]
+
+        pieces = quantity if unit in (None, "unit") else None
+        items = []
+        for index, row in enumerate(rows):
+            if index == len(rows) - 1:
+                grams = self._grams(row, quantity, unit)
+            else:
+                grams = self._grams(row, pieces, None)
+            items.append(FoodItem(text, grams * scale, self.names[row], row))
+        return items
+
+    def estimate(self, description: str) -> FoodEstimate:
+        """Parse a free-text meal into items and total the ones that resolve."""
+        estimate = FoodEstimate()
+        totals = np.zeros(len(MACRO_COLUMNS), dtype=np.float64)
+        for part in _ITEM_SPLIT.split(description):
+            if not tokenize(part):
+                continue
+            items = self.parse_item(part)
+            estimate.items.extend(items)
+            for item in items:
+                if item.row is None:
+                    estimate.unresolved.append(item.text)
+                    continue
+                totals += self.table[item.row, : len(MACRO_COLUMNS)] * (item.grams / 100)
+        if len(estimate.unresolved) < len(estimate.items):
+            estimate.macros = {
+                name: round(float(totals[column]), 1) for name, column in MACRO_COLUMNS.items()
+            }
+        return estimate
+
+
+_db = None
+_db_lock = threading.Lock()
+
+
+def get_food_db() -> FoodDB:
+    global _db
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                _db = FoodDB.load()
+    return _db
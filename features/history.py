@@ -1,11 +1,250 @@
+import datetime
+import os
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+
 import streamlit as st
-from dotenv import load_dotenv
+from boto3.dynamodb.conditions import Key
+
+from features.aws_clients import get_table
+from features.downloads import export_plans_pdf, export_plans_zip
+
+# "dynamodb" (table keyed by user_id + created_at) or "sqlite" for local runs.
+HISTORY_BACKEND = os.getenv("HISTORY_BACKEND", "dynamodb")
+MEAL_PLAN_TABLE = os.getenv("MEAL_PLAN_TABLE", "wellness-meal-plans")
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", "meal_plans.db")
+PAGE_SIZE = 5
+PREVIEW_CHARS = 160
+SESSION_PAGE_CACHE = 5
+
+
+def _compress(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), 6)
+
+
+def _decompress(data: bytes) -> str:
+    return zlib.decompress(data).decode("utf-8")
+
+
+def _preview(text: str) -> str:
+    flat = " ".join(text.split())
+    return flat[:PREVIEW_CHARS] + ("…" if len(flat) > PREVIEW_CHARS else "")
+
+
+class DynamoHistoryStore:
+    """Meal plans in DynamoDB: partition key user_id, sort key created_at."""
+
+    def save(self, item: dict):
+        # Written straight through: the history list is read right after a
+        # plan is generated and must already include it.
+        get_table(MEAL_PLAN_TABLE).put_item(Item=item)
+
+    def list(self, user_id, limit, cursor=None):
+        query = {
+            "KeyConditionExpression": Key("user_id").eq(user_id),
+            "ScanIndexForward": False,
+            # One extra item tells whether an older page exists: DynamoDB also
+            # returns a LastEvaluatedKey when the page ends at the last item.
+            "Limit": limit + 1,
+            # Metadata only; bodies are fetched when a plan is opened.
+            "ProjectionExpression": "created_at, #scope, preview",
+            "ExpressionAttributeNames": {"#scope": "scope"},
+        }
+        if cursor:
+            query["ExclusiveStartKey"] = {"user_id": user_id, "created_at": cursor}
+        response = get_table(MEAL_PLAN_TABLE).query(**query)
+        items = response.get("Items", [])
+        if len(items) > limit:
+            return items[:limit], items[limit - 1]["created_at"]
+        # A short page can still be cut off by DynamoDB's 1 MB response limit.
+        next_key = response.get("LastEvaluatedKey")
+        return items, next_key["created_at"] if next_key else None
+
+    def body(self, user_id, created_at):
+        response = get_table(MEAL_PLAN_TABLE).get_item(
+            Key={"user_id": user_id, "created_at": created_at},
+            ProjectionExpression="body",
+        )
+        item = response.get("Item")
+        return _decompress(bytes(item["body"])) if item else None
+
+
+class SQLiteHistoryStore:
+    """Local stand-in with the same layout as the DynamoDB table."""
+
+    def __init__(self, path=HISTORY_DB_PATH):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS meal_plans ("
+            "user_id TEXT NOT NULL, created_at TEXT NOT NULL, scope TEXT, "
+            "preview TEXT, body BLOB NOT NULL, PRIMARY KEY (user_id, created_at))"
+        )
+        self._db.commit()
+
+    def save(self, item: dict):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO meal_plans VALUES (?, ?, ?, ?, ?)",
+                (
+                    item["user_id"],
+                    item["created_at"],
+                    item["scope"],
+                    item["preview"],
+                    item["body"],
+                ),
+            )
+            self._db.commit()
+
+    def list(self, user_id, limit, cursor=None):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT created_at, scope, preview FROM meal_plans "
+                "WHERE user_id = ? AND (? IS NULL OR created_at < ?) "
+                "ORDER BY created_at DESC LIMIT ?",
+                (user_id, cursor, cursor, limit + 1),
+            ).fetchall()
+        items = [
+            {"created_at": row[0], "scope": row[1], "preview": row[2]}
+            for row in rows[:limit]
+        ]
+        next_cursor = items[-1]["created_at"] if len(rows) > limit else None
+        return items, next_cursor
+
+    def body(self, user_id, created_at):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body FROM meal_plans WHERE user_id = ? AND created_at = ?",
+                (user_id, created_at),
+            ).fetchone()
+        return _decompress(row[0]) if row else None
+
 
-load_dotenv()
+_store = None
+_store_lock = threading.Lock()
 
 
-def display_meal_plan_history(history_list):
+def get_history_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if HISTORY_BACKEND == "sqlite":
+                    _store = SQLiteHistoryStore()
+                else:
+                    _store = DynamoHistoryStore()
+    return _store
+
+
+def store_meal_plan(user_id, plan_text, scope):
+    """
+    Persist a generated plan with a compressed body; returns its created_at key.
+
+    Safe to call from background threads. Pages cached in the browser session
+    are not refreshed; use ``save_meal_plan`` from the script thread.
+    """
+    created_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    get_history_store().save(
+        {
+            "user_id": user_id,
+            "created_at": created_at,
+            "scope": scope,
+            "preview": _preview(plan_text),
+            "body": _compress(plan_text),
+        }
+    )
+    return created_at
+
+
+def invalidate_history_pages():
+    """Drop this session's cached pages so the newest plans show up."""
+    st.session_state.pop("history_pages", None)
+
+
+def save_meal_plan(user_id, plan_text, scope):
+    created_at = store_meal_plan(user_id, plan_text, scope)
+    invalidate_history_pages()
+    return created_at
+
+
+def _load_page(user_id, cursor):
+    """Page of plan metadata, served from a small per-session LRU when possible."""
+    # Keyed by user too: saving a new profile switches the session's user_id.
+    pages = st.session_state.setdefault("history_pages", OrderedDict())
+    key = (user_id, cursor)
+    if key in pages:
+        pages.move_to_end(key)
+        return pages[key]
+    page = get_history_store().list(user_id, PAGE_SIZE, cursor)
+    pages[key] = page
+    while len(pages) > SESSION_PAGE_CACHE:
+        pages.popitem(last=False)
+    return page
+
+
+def _load_body(user_id, created_at):
+    bodies = st.session_state.setdefault("history_bodies", OrderedDict())
+    key = (user_id, created_at)
+    if key not in bodies:
+        bodies[key] = get_history_store().body(user_id, created_at)
+        while len(bodies) > PAGE_SIZE * 2:
+            bodies.popitem(last=False)
+    return bodies[key]
+
+
+def _iter_all_plans(user_id):
+    cursor = None
+    while True:
+        items, cursor = get_history_store().list(user_id, PAGE_SIZE * 4, cursor)
+        for item in items:
+            # Full created_at keeps names unique for plans saved in the same second.
+            yield item["created_at"], get_history_store().body(
+                user_id, item["created_at"]
+            )
+        if not cursor:
+            return
+
+
+def display_meal_plan_history(user_id):
     st.markdown("## 🕒Previous Meal Plans")
-    for i, plan in enumerate(reversed(history_list)):
-        st.markdown(f"### Day {i + 1} ({plan['date']})")
-        st.text(plan["meal_plan"])
+
+    # Stack of cursors per user: the last one is the start of the page shown.
+    cursors = st.session_state.setdefault("history_cursors", {}).setdefault(user_id, [None])
+    items, next_cursor = _load_page(user_id, cursors[-1])
+
+    if not items and len(cursors) == 1:
+        st.info("No saved meal plans yet.")
+        return
+
+    for item in items:
+        created = item["created_at"][:16].replace("T", " ")
+        with st.expander(f"{created} UTC · {item.get('scope', '')}"):
+            st.caption(item.get("preview", ""))
+            if st.toggle("Show full plan", key=f"history_{item['created_at']}"):
+                st.markdown(_load_body(user_id, item["created_at"]))
+
+    col_prev, col_next = st.columns(2)
+    if len(cursors) > 1 and col_prev.button("⬅️ Newer"):
+        cursors.pop()
+        st.rerun()
+    if next_cursor and col_next.button("Older ➡️"):
+        cursors.append(next_cursor)
+        st.rerun()
+
+    col_zip, col_pdf = st.columns(2)
+    if col_zip.button("📦 Prepare all plans (ZIP)"):
+        # Streamlit serves downloads from bytes, so read the finished archive.
+        with export_plans_zip(_iter_all_plans(user_id)) as archive:
+            col_zip.download_button(
+                "⬇️ Download ZIP", archive.read(), file_name="meal_plans.zip"
+            )
+    if col_pdf.button("📄 Prepare all plans (one PDF)"):
+        plans = (
+            (f"{created_at[:16].replace('T', ' ')} UTC", text)
+            for created_at, text in _iter_all_plans(user_id)
+        )
+        col_pdf.download_button(
+            "⬇️ Download PDF", export_plans_pdf(plans), file_name="meal_plans.pdf"
+        )
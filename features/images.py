@@ -0,0 +1,80 @@
+import hashlib
+import io
+import logging
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Claude resizes anything with a longer edge above ~1568px, so sending more
+# pixels only costs upload time and input tokens.
+MAX_EDGE = 1568
+JPEG_QUALITY = 85
+CACHE_SIZE = 64
+
+_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def detect_media_type(data: bytes):
+    """MIME type from the file's magic bytes, or None if unrecognised."""
+    for signature, media_type in _SIGNATURES:
+        if data.startswith(signature):
+            return media_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def _reencode(data: bytes):
+    with Image.open(io.BytesIO(data)) as image:
+        # Apply the EXIF rotation before the metadata is dropped.
+        image = ImageOps.exif_transpose(image)
+        if max(image.size) > MAX_EDGE:
+            image.thumbnail((MAX_EDGE, MAX_EDGE), Image.LANCZOS)
+
+        out = io.BytesIO()
+        if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+            image.save(out, format="PNG", optimize=True)
+            return out.getvalue(), "image/png"
+        image.convert("RGB").save(
+            out, format="JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True
+        )
+        return out.getvalue(), "image/jpeg"
+
+
+def prepare_image(data: bytes):
+    """
+    Downscale, recompress and strip metadata from an uploaded image.
+
+    Returns ``(bytes, media_type)``. Results are cached by content hash, so
+    reruns with the same upload don't re-encode it. Files Pillow can't read
+    are passed through with their detected type.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    with _cache_lock:
+        if digest in _cache:
+            _cache.move_to_end(digest)
+            return _cache[digest]
+
+    try:
+        result = _reencode(data)
+    except Exception:
+        logger.warning("Could not re-encode image; sending it unchanged")
+        result = (data, detect_media_type(data) or "image/jpeg")
+    logger.info("Prepared image: %d -> %d bytes", len(data), len(result[0]))
+
+    with _cache_lock:
+        _cache[digest] = result
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
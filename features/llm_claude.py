@@ -1,62 +1,387 @@
-import boto3
 import os
 import json
 import base64
-from typing import Optional
-from features.env_loader import load_env_variables
+import time
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+from features.aws_clients import get_bedrock_client
+from features import metrics
+from features.images import prepare_image
+from features.llm_scheduler import (  # noqa: F401 (re-exported for callers)
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    LLMScheduler,
+    QueueFull,
+)
+from features.response_cache import ResponseCache, make_cache_key
 
-# Load .env file variables
-load_env_variables()
-region = os.getenv("AWS_REGION", "us-east-1")
-bedrock = boto3.client("bedrock-runtime", region_name=region)
+logger = logging.getLogger(__name__)
 
+# Every Bedrock request from this process goes through one scheduler, shared
+# by all Streamlit sessions: at most MAX_CONCURRENT_CALLS in flight, a bounded
+# priority queue, and a token bucket sized to the account's requests/minute.
+MAX_CONCURRENT_CALLS = int(os.getenv("CLAUDE_MAX_CONCURRENCY", "4"))
+MAX_QUEUED_CALLS = int(os.getenv("CLAUDE_MAX_QUEUE", "64"))
+REQUESTS_PER_MINUTE = float(os.getenv("CLAUDE_REQUESTS_PER_MINUTE", "200"))
+MAX_RETRIES = int(os.getenv("CLAUDE_MAX_RETRIES", "2"))
+RETRY_BACKOFF_SECONDS = 1.0
 
-def call_claude(prompt: str, image: Optional[bytes] = None):
-    """
-    Call Claude 3 Sonnet with optional image (bytes).
-    """
-    messages = []
+scheduler = LLMScheduler(
+    max_concurrency=MAX_CONCURRENT_CALLS,
+    max_queue=MAX_QUEUED_CALLS,
+    rate_per_minute=REQUESTS_PER_MINUTE,
+    burst=MAX_CONCURRENT_CALLS * 2,
+)
+
+MODEL_ID = "anthropic.claude-3-sonnet-20240229-v1:0"
+INFERENCE_PARAMS = {
+    "max_tokens": 400,
+    "top_k": 250,
+    "temperature": 1,
+    "top_p": 0.999,
+    "stop_sequences": [],
+}
+
+# Claude 3 Sonnet on-demand pricing (USD per 1K tokens).
+INPUT_PRICE_PER_1K = 0.003
+OUTPUT_PRICE_PER_1K = 0.015
+
+# Identical requests (same model, parameters, prompt and image) are served from
+# this cache. Set CLAUDE_CACHE_PATH to keep responses on disk across restarts.
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("CLAUDE_CACHE_SIZE", "256")),
+    ttl=int(os.getenv("CLAUDE_CACHE_TTL", "86400")),
+    path=os.getenv("CLAUDE_CACHE_PATH") or None,
+)
+
+
+@dataclass
+class ClaudeResponse:
+    text: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    latency: float = 0.0
+    cached: bool = False
+
+    @property
+    def cost(self) -> float:
+        return estimate_cost(self.input_tokens, self.output_tokens)
+
+
+def estimate_cost(input_tokens: int, output_tokens: int) -> float:
+    return (
+        input_tokens / 1000 * INPUT_PRICE_PER_1K
+        + output_tokens / 1000 * OUTPUT_PRICE_PER_1K
+    )
+
+
+def _inference_params(max_tokens: Optional[int] = None) -> dict:
+    if max_tokens is None:
+        return INFERENCE_PARAMS
+    return dict(INFERENCE_PARAMS, max_tokens=max_tokens)
+
+
+def _record_usage(input_tokens: int, output_tokens: int):
+    metrics.increment("llm_tokens_total", input_tokens, model_id=MODEL_ID, type="input")
+    metrics.increment("llm_tokens_total", output_tokens, model_id=MODEL_ID, type="output")
 
-    if image:
-        # Convert image bytes to base64
-        encoded_image = base64.b64encode(image).decode("utf-8")
 
-        messages = [
+def _prepare_images(image: Optional[bytes], images: Optional[List[bytes]]):
+    """Downscaled ``(bytes, media_type)`` pairs for every image in the request."""
+    raw = ([image] if image else []) + list(images or [])
+    return [prepare_image(data) for data in raw]
+
+
+def _build_payload(
+    prompt: str,
+    images: Optional[List[Tuple[bytes, str]]] = None,
+    params: Optional[dict] = None,
+) -> dict:
+    content = [{"type": "text", "text": prompt}]
+    for data, media_type in images or []:
+        # Convert image bytes to base64
+        content.append(
             {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt},
-                    {
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": "image/png",
-                            "data": encoded_image,
-                        },
-                    },
-                ],
+                "type": "image",
+                "source": {
+                    "type": "base64",
+                    "media_type": media_type,
+                    "data": base64.b64encode(data).decode("utf-8"),
+                },
             }
-        ]
-    else:
-        # Text-only prompt
-        messages = [{"role": "user", "content": [{"type": "text", "text": prompt}]}]
+        )
 
-    payload = {
+    return {
         "anthropic_version": "bedrock-2023-05-31",
-        "max_tokens": 400,
-        "top_k": 250,
-        "temperature": 1,
-        "top_p": 0.999,
-        "stop_sequences": [],
-        "messages": messages,
+        **(params or INFERENCE_PARAMS),
+        "messages": [{"role": "user", "content": content}],
     }
 
-    response = bedrock.invoke_model(
-        modelId="anthropic.claude-3-sonnet-20240229-v1:0",
-        contentType="application/json",
-        accept="application/json",
-        body=json.dumps(payload),
+
+def _coalesce_key(cache_key: str, use_cache: bool) -> str:
+    """Key for sharing an in-flight call; unique when the cache is skipped,
+    since a caller asking for a fresh answer shouldn't get someone else's."""
+    return cache_key if use_cache else f"{cache_key}#{uuid.uuid4().hex}"
+
+
+def invoke_claude(
+    prompt: str,
+    image: Optional[bytes] = None,
+    use_cache: bool = True,
+    max_tokens: Optional[int] = None,
+    images: Optional[List[bytes]] = None,
+    priority: int = PRIORITY_INTERACTIVE,
+    on_wait: Optional[Callable[[int], None]] = None,
+) -> ClaudeResponse:
+    """
+    Call Claude and return the text together with token usage and latency.
+
+    ``images`` sends several pictures in the same request. The call goes
+    through the process-wide scheduler in the given ``priority`` lane;
+    ``on_wait(position)`` reports the queue position while it waits. Cache
+    hits and requests coalesced with an identical one in flight report zero
+    tokens, since they cost nothing.
+    """
+    params = _inference_params(max_tokens)
+    prepared = _prepare_images(image, images)
+    cache_key = make_cache_key(MODEL_ID, params, prompt, *(data for data, _ in prepared))
+    if use_cache:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            metrics.increment("llm_cache_hits_total", model_id=MODEL_ID)
+            return ClaudeResponse(text=cached, cached=True)
+
+    join_key = _coalesce_key(cache_key, use_cache)
+    future, leader = scheduler.join(join_key)
+    if not leader:
+        return ClaudeResponse(text=future.result(), cached=True)
+
+    payload = json.dumps(_build_payload(prompt, prepared, params))
+
+    def call():
+        with metrics.span("bedrock.invoke_model", model_id=MODEL_ID) as span:
+            started = time.perf_counter()
+            response = get_bedrock_client().invoke_model(
+                modelId=MODEL_ID,
+                contentType="application/json",
+                accept="application/json",
+                body=payload,
+            )
+            result = json.loads(response["body"].read())
+            span.update(result.get("usage", {}))
+            return result, time.perf_counter() - started
+
+    try:
+        result, latency = scheduler.run(call, priority, on_wait)
+    except Exception as exc:
+        scheduler.finish(join_key, error=exc)
+        raise
+    text = result["content"][0]["text"]
+    response_cache.set(cache_key, text)
+    scheduler.finish(join_key, result=text)
+
+    usage = result.get("usage", {})
+    input_tokens = usage.get("input_tokens", 0)
+    output_tokens = usage.get("output_tokens", 0)
+    _record_usage(input_tokens, output_tokens)
+    return ClaudeResponse(
+        text=text,
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        latency=latency,
+    )
+
+
+def call_claude(prompt: str, image: Optional[bytes] = None, use_cache: bool = True):
+    """
+    Call Claude 3 Sonnet with optional image (bytes).
+    """
+    return invoke_claude(prompt, image=image, use_cache=use_cache).text
+
+
+def _open_stream(payload: str, priority: int, on_wait):
+    """
+    Acquire a scheduler slot and open a response stream, backing off if
+    Bedrock throttles. The caller releases the slot once the stream is read.
+    """
+    for attempt in range(scheduler.max_throttle_retries + 1):
+        scheduler.acquire(priority, on_wait)
+        try:
+            return get_bedrock_client().invoke_model_with_response_stream(
+                modelId=MODEL_ID,
+                contentType="application/json",
+                accept="application/json",
+                body=payload,
+            )
+        except Exception as exc:
+            scheduler.release()
+            if not scheduler.is_throttle(exc) or attempt == scheduler.max_throttle_retries:
+                raise
+        scheduler.backoff(attempt)
+
+
+def stream_claude(
+    prompt: str,
+    image: Optional[bytes] = None,
+    use_cache: bool = True,
+    timings: Optional[dict] = None,
+    priority: int = PRIORITY_INTERACTIVE,
+    on_wait: Optional[Callable[[int], None]] = None,
+) -> Iterator[str]:
+    """
+    Stream Claude's answer as text deltas.
+
+    If ``timings`` is given it is filled with ``time_to_first_token`` and
+    ``total_time`` (seconds) once the stream finishes. ``priority`` and
+    ``on_wait`` are as for ``invoke_claude``.
+    """
+    started = time.perf_counter()
+    first_token_at = None
+
+    prepared = _prepare_images(image, None)
+    cache_key = make_cache_key(
+        MODEL_ID, INFERENCE_PARAMS, prompt, *(data for data, _ in prepared)
     )
+    cached = response_cache.get(cache_key) if use_cache else None
+    join_key = _coalesce_key(cache_key, use_cache)
+    future, leader = (None, False) if cached is not None else scheduler.join(join_key)
+    if not leader and cached is None:
+        # The same prompt is already streaming for someone else; share it.
+        try:
+            cached = future.result()
+        except Exception:
+            future, leader = scheduler.join(join_key)
+            cached = None if leader else future.result()
+
+    if cached is not None:
+        metrics.increment("llm_cache_hits_total", model_id=MODEL_ID)
+        first_token_at = time.perf_counter()
+        yield cached
+    else:
+        parts = []
+        usage = {}
+        try:
+            payload = json.dumps(_build_payload(prompt, prepared))
+            response = _open_stream(payload, priority, on_wait)
+            try:
+                with metrics.span("bedrock.stream", model_id=MODEL_ID) as span:
+                    for event in response["body"]:
+                        chunk = event.get("chunk")
+                        if not chunk:
+                            continue
+                        data = json.loads(chunk["bytes"])
+                        if data.get("type") == "message_start":
+                            usage.update(data.get("message", {}).get("usage", {}))
+                        elif data.get("type") == "message_delta":
+                            usage.update(data.get("usage", {}))
+                        if data.get("type") != "content_block_delta":
+                            continue
+                        delta = data["delta"].get("text", "")
+                        if not delta:
+                            continue
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        parts.append(delta)
+                        yield delta
+                    span.update(usage)
+            finally:
+                scheduler.release()
+        except BaseException as exc:
+            error = exc if isinstance(exc, Exception) else RuntimeError("stream closed")
+            scheduler.finish(join_key, error=error)
+            raise
+        text = "".join(parts)
+        response_cache.set(cache_key, text)
+        scheduler.finish(join_key, result=text)
+        _record_usage(usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+        metrics.observe(
+            "llm_time_to_first_token_seconds",
+            (first_token_at or time.perf_counter()) - started,
+            model_id=MODEL_ID,
+        )
+
+    finished = time.perf_counter()
+    ttft = (first_token_at or finished) - started
+    total = finished - started
+    logger.info("Claude stream: first token %.2fs, total %.2fs", ttft, total)
+    if timings is not None:
+        timings["time_to_first_token"] = ttft
+        timings["total_time"] = total
 
-    result = json.loads(response["body"].read())
-    return result["content"][0]["text"]
+
+def get_cache_stats() -> dict:
+    """Hit, miss and eviction counters for the Claude response cache."""
+    return response_cache.get_stats()
+
+
+def get_queue_stats() -> dict:
+    """Queue depth and recent wait times of the Bedrock request scheduler."""
+    return scheduler.stats()
+
+
+def _call_with_retry(
+    prompt: str, retries: int, max_tokens: Optional[int], priority: int, use_cache: bool
+):
+    """
+    Call Claude, retrying this one prompt with exponential backoff.
+
+    Throttling is not retried here: the scheduler already backed off and
+    re-queued the call before giving up.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return invoke_claude(
+                prompt, max_tokens=max_tokens, priority=priority, use_cache=use_cache
+            )
+        except Exception as exc:
+            if attempt == retries or scheduler.is_throttle(exc):
+                raise
+            time.sleep(RETRY_BACKOFF_SECONDS * 2**attempt)
+
+
+def call_claude_many(
+    prompts: List[str],
+    retries: int = MAX_RETRIES,
+    max_tokens: Optional[int] = None,
+    priority: int = PRIORITY_BATCH,
+    use_cache: bool = True,
+) -> Iterator[Tuple[int, Optional[ClaudeResponse], Optional[Exception]]]:
+    """
+    Fan out several prompts to Claude at once.
+
+    Yields ``(index, response, error)`` as each prompt finishes, so callers can
+    render results immediately and slot them back into prompt order. A prompt
+    that still fails after its own retries yields its exception instead of
+    aborting the others. Fan-outs are batch work, so they queue behind
+    interactive requests by default.
+    """
+    if not prompts:
+        return
+
+    with ThreadPoolExecutor(max_workers=len(prompts)) as pool:
+        futures = {
+            pool.submit(_call_with_retry, prompt, retries, max_tokens, priority, use_cache): index
+            for index, prompt in enumerate(prompts)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                yield index, future.result(), None
+            except Exception as exc:
+                yield index, None, exc
+
+
+def summarize_usage(responses: Iterable[ClaudeResponse]) -> dict:
+    """Total billed requests, tokens and cost for a set of calls."""
+    responses = list(responses)
+    input_tokens = sum(r.input_tokens for r in responses)
+    output_tokens = sum(r.output_tokens for r in responses)
+    return {
+        "requests": sum(1 for r in responses if not r.cached),
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cost": estimate_cost(input_tokens, output_tokens),
+    }
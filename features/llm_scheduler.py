@@ -0,0 +1,210 @@
+import heapq
+import itertools
+import random
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from botocore.exceptions import ClientError
+
+from features import metrics
+
+# Lower runs first: a user waiting on a single-day plan goes ahead of weekly
+# batches and daily summaries queued by other sessions.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+LANES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BATCH: "batch"}
+
+THROTTLE_ERRORS = (
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+)
+
+
+class QueueFull(RuntimeError):
+    """Raised when the request queue is at capacity; try again shortly."""
+
+
+class LLMScheduler:
+    """
+    Process-wide admission control for model calls.
+
+    Callers wait in a bounded priority queue until a concurrency slot is free
+    and the token bucket (``rate_per_minute``, bursting to ``burst``) allows
+    another request. Identical requests already in flight are coalesced with
+    ``join``/``finish``, and throttled calls back off with jitter.
+    """
+
+    def __init__(
+        self,
+        max_concurrency=4,
+        max_queue=64,
+        rate_per_minute=200,
+        burst=8,
+        max_throttle_retries=4,
+        base_delay=1.0,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_throttle_retries = max_throttle_retries
+        self.base_delay = base_delay
+        self._cond = threading.Condition()
+        self._waiting = []  # heap of (priority, sequence)
+        self._sequence = itertools.count()
+        self._active = 0
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._recent_waits = deque(maxlen=200)
+        self._in_flight = {}  # request key -> Future of its result
+
+    def _refill(self):
+        now = time.monotonic()
+        refill = (now - self._refilled_at) * self.rate
+        self._tokens = min(self.burst, self._tokens + refill)
+        self._refilled_at = now
+
+    def _position(self, entry) -> int:
+        return 1 + sum(1 for other in self._waiting if other < entry)
+
+    def _try_admit(self, entry):
+        """``(admitted, seconds to wait)``; call with the lock held."""
+        if self._waiting[0] != entry or self._active >= self.max_concurrency:
+            return False, 0.25
+        self._refill()
+        if self._tokens < 1:
+            return False, (1 - self._tokens) / self.rate
+        heapq.heappop(self._waiting)
+        self._tokens -= 1
+        self._active += 1
+        # The next caller in line may be able to go too.
+        self._cond.notify_all()
+        return True, 0
+
+    def acquire(self, priority=PRIORITY_INTERACTIVE, on_wait=None) -> float:
+        """
+        Wait for a request slot and return the seconds spent queued.
+
+        ``on_wait(position)`` is called (outside the lock) whenever the
+        caller's 1-based queue position changes. Every successful ``acquire``
+        must be paired with ``release``.
+        """
+        entry = (priority, next(self._sequence))
+        lane = LANES.get(priority, str(priority))
+        queued = time.monotonic()
+        with self._cond:
+            if len(self._waiting) >= self.max_queue:
+                metrics.increment("llm_rejected_total", lane=lane)
+                raise QueueFull(f"{len(self._waiting)} model requests already queued")
+            heapq.heappush(self._waiting, entry)
+
+        reported = None
+        try:
+            while True:
+                with self._cond:
+                    admitted, timeout = self._try_admit(entry)
+                    if admitted:
+                        break
+                    position = self._position(entry)
+                    if on_wait is None or position == reported:
+                        self._cond.wait(timeout)
+                        continue
+                reported = position
+                on_wait(position)
+        except BaseException:
+            with self._cond:
+                if entry in self._waiting:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                self._cond.notify_all()
+            raise
+
+        waited = time.monotonic() - queued
+        metrics.observe("llm_queue_seconds", waited, lane=lane)
+        with self._cond:
+            self._recent_waits.append(waited)
+        return waited
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def admit(self, priority=PRIORITY_INTERACTIVE, on_wait=None):
+        """Hold one request slot for the duration of the block."""
+        waited = self.acquire(priority, on_wait)
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    def run(self, call, priority=PRIORITY_INTERACTIVE, on_wait=None):
+        """Admit and run ``call()``, backing off and re-queueing when throttled."""
+        for attempt in range(self.max_throttle_retries + 1):
+            with self.admit(priority, on_wait):
+                try:
+                    return call()
+                except ClientError as exc:
+                    if not self.is_throttle(exc) or attempt == self.max_throttle_retries:
+                        raise
+            self.backoff(attempt)
+
+    @staticmethod
+    def is_throttle(exc) -> bool:
+        return (
+            isinstance(exc, ClientError)
+            and exc.response.get("Error", {}).get("Code") in THROTTLE_ERRORS
+        )
+
+    def backoff(self, attempt: int):
+        """Full-jitter exponential backoff after a throttled call."""
+        metrics.increment("llm_throttled_total")
+        with self._cond:
+            # Throttling means the bucket is too generous right now; drain it.
+            self._tokens = min(self._tokens, 0.0)
+        time.sleep(random.uniform(0, self.base_delay * 2**attempt))
+
+    def join(self, key):
+        """
+        ``(future, is_leader)`` for a request key.
+
+        The leader makes the call and must ``finish`` the key; followers wait
+        on the future for the leader's result instead of calling again.
+        """
+        with self._cond:
+            future = self._in_flight.get(key)
+            if future is not None:
+                metrics.increment("llm_coalesced_total")
+                return future, False
+            future = self._in_flight[key] = Future()
+            return future, True
+
+    def finish(self, key, result=None, error=None):
+        with self._cond:
+            future = self._in_flight.pop(key, None)
+        if future is None:
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def stats(self) -> dict:
+        """Queue depth per lane, requests running and recent wait times (seconds)."""
+        with self._cond:
+            waiting = [priority for priority, _ in self._waiting]
+            waits = list(self._recent_waits)
+            active = self._active
+        return {
+            "queued": len(waiting),
+            "queued_by_lane": {name: waiting.count(p) for p, name in LANES.items()},
+            "running": active,
+            "wait_p50": statistics.median(waits) if waits else 0.0,
+            "wait_p95": sorted(waits)[int(len(waits) * 0.95)] if waits else 0.0,
+        }
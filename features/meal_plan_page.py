@@ -0,0 +1,388 @@
+import logging
+import time
+
+import streamlit as st
+
+# Feature modules that pull in boto3 or fpdf are imported where they are first
+# needed, so the profile form paints without loading them. Later reruns get
+# them from sys.modules.
+from features.pantry import MAX_IMAGES, clear_pantry, get_pantry
+from features.profile_context import get_profile_context
+
+WEEK_MODE_PER_DAY = "Per-day requests"
+WEEK_MODE_SINGLE = "Single request (structured)"
+JOB_POLL_SECONDS = 1.0
+
+
+def meal_plan_page():
+    st.title("🌱 Wellness Daily Meal Plan Generator")
+
+    # 🔹 USER PROFILE FORM
+    with st.form("user_profile_form"):
+        st.header("👤 Your Health & Lifestyle Info")
+
+        col1, col2 = st.columns(2)
+        age = col1.number_input("Age", min_value=10, max_value=100)
+        gender = col2.selectbox("Gender", ["Female", "Male", "Other"])
+
+        col3, col4 = st.columns(2)
+        height = col3.number_input("Height (cm)", min_value=100, max_value=250)
+        weight = col4.number_input("Weight (kg)", min_value=30, max_value=200)
+
+        body_fat = st.slider("Body Fat Percentage (if known)", 5.0, 50.0, 20.0)
+
+        activity_level = st.selectbox(
+            "Activity Level",
+            [
+                "Sedentary (little or no exercise)",
+                "Lightly active (light exercise/sports 1–3 days/week)",
+                "Moderately active (moderate exercise/sports 3–5 days/week)",
+                "Very active (hard exercise/sports 6–7 days/week)",
+                "Super active (very hard exercise/physical job)",
+            ],
+        )
+
+        with st.expander("❓ Not sure which activity level? Click for examples"):
+            st.markdown(
+                """
+        - **Sedentary**: Desk job, under 3,000 steps/day, little to no exercise  
+        - **Lightly active**: 3,000–7,000 steps/day, light exercise 1–3 times/week  
+        - **Moderately active**: 7,000–10,000 steps/day, regular workouts 3–5 times/week  
+        - **Very active**: 10,000–15,000 steps/day, hard exercise 6–7 days/week  
+        - **Super active**: Intense daily training or physically demanding job  
+        """
+            )
+
+        st.markdown("#### 🥚 Allergies or Intolerances")
+
+        common_allergies = [
+            "Dairy",
+            "Eggs",
+            "Fish",
+            "Gluten",
+            "Peanuts",
+            "Shellfish",
+            "Soy",
+            "Tree nuts",
+            "Wheat",
+        ]
+
+        selected_allergies = st.multiselect(
+            "Select any known allergies/intolerances (you can choose multiple):",
+            options=common_allergies,
+        )
+
+        custom_allergies = st.text_input(
+            "Or enter any other allergies (comma-separated):"
+        )
+
+        allergies_combined = selected_allergies + [
+            a.strip() for a in custom_allergies.split(",") if a.strip()
+        ]
+
+        diet_type = st.selectbox(
+            "Diet Type", ["None", "Vegetarian", "Vegan", "Keto", "Paleo", "Other"]
+        )
+        cooking_equipment = st.text_input("Available Cooking Equipment")
+
+        st.markdown("#### 🌟 Health Goals")
+
+        goal_options = [
+            "Lose weight",
+            "Gain muscle",
+            "Improve metabolic markers",
+            "Maintain weight",
+            "Other",
+        ]
+
+        selected_goals = st.multiselect(
+            "Select your health goals (you can choose more than one):",
+            options=goal_options,
+        )
+
+        custom_goal = st.text_input("Any other goals or motivations? (optional):")
+
+        goals_combined = (
+            selected_goals + [custom_goal.strip()]
+            if custom_goal.strip()
+            else selected_goals
+        )
+
+        goal_details = st.text_area("Specific goal details or timeline (optional)")
+
+        submitted = st.form_submit_button("Save Profile")
+
+    if submitted:
+        profile = {
+            "age": age,
+            "gender": gender,
+            "height": height,
+            "weight": weight,
+            "body_fat": body_fat,
+            "activity_level": activity_level,
+            "allergies": ", ".join(allergies_combined),
+            "diet_type": diet_type,
+            "cooking_equipment": cooking_equipment,
+            "goal": ", ".join(goals_combined),
+            "goal_details": goal_details,
+        }
+
+        context = get_profile_context(profile)
+
+        profile["bmi"] = context.bmi
+        profile["bmr"] = context.bmr
+        profile["tdee"] = context.tdee
+
+        st.session_state["profile"] = profile
+        from features.dynamo import save_profile_to_dynamodb
+
+        user_id = save_profile_to_dynamodb(profile)
+        st.session_state["user_id"] = user_id
+
+        st.success("✅ Profile saved and health stats calculated!")
+
+        with st.expander("📊 See personalized health strategy"):
+            st.markdown(context.stats_markdown)
+            st.markdown(context.strategy_markdown)
+            st.markdown(context.summary_markdown)
+
+    # 🍳 Meal Plan Customization
+    st.header("🍳 Meal Plan Customization")
+
+    plan_scope = st.radio(
+        "How long should the meal plan cover?",
+        ["1 Day", "7 Days (Week)"],
+        horizontal=True,
+    )
+
+    week_mode = WEEK_MODE_PER_DAY
+    if plan_scope == "7 Days (Week)":
+        week_mode = st.radio(
+            "How should the week be generated?",
+            [WEEK_MODE_PER_DAY, WEEK_MODE_SINGLE],
+            horizontal=True,
+            help="A single request sends your profile once and returns structured meals.",
+        )
+
+    st.markdown("#### 🥗 Provide available foods")
+    uploaded_files = st.file_uploader(
+        "📷 Upload up to 3 images (grocery receipt or fridge)",
+        type=["jpg", "jpeg", "png"],
+        accept_multiple_files=True,
+        help="Upload up to 3 images",
+        key="multi_uploader",
+    )
+
+    if uploaded_files and len(uploaded_files) > MAX_IMAGES:
+        st.warning(f"Only the first {MAX_IMAGES} images will be used.")
+
+    pantry_items = get_pantry(st.session_state.get("user_id"))
+    if pantry_items:
+        st.caption("🧺 Your pantry: " + ", ".join(pantry_items))
+        if st.button("🧹 Clear pantry"):
+            clear_pantry(st.session_state.get("user_id"))
+            st.rerun()
+
+    fridge_items = st.text_area(
+        "🥗 Enter a list of ingredients or foods in your fridge"
+    )
+
+    fresh_plan = st.checkbox(
+        "Always generate a fresh plan",
+        help=(
+            "By default, a plan made for a near-identical profile (or an "
+            "identical earlier request) is reused instantly."
+        ),
+    )
+    generate_plan_clicked = st.button("🍽️ Generate Meal Plan")
+    week_job = None
+    if "week_job_id" in st.session_state:
+        from features.plan_jobs import get_job
+
+        week_job = get_job(st.session_state["week_job_id"])
+        if week_job is None:
+            # Pruned after JOB_TTL_SECONDS, or lost with a restart.
+            del st.session_state["week_job_id"]
+    plan_shown = generate_plan_clicked
+
+    if generate_plan_clicked:
+        if "profile" not in st.session_state:
+            st.warning("⚠️ Please fill out and save your profile first.")
+        else:
+            context = get_profile_context(st.session_state["profile"])
+            user_id = st.session_state.get("user_id")
+
+            # One vision request per set of uploads; the extracted ingredients
+            # are kept as the user's pantry and reused by every day's prompt.
+            if uploaded_files:
+                from features.pantry import extract_ingredients, update_pantry
+
+                images = [f.getvalue() for f in uploaded_files[:MAX_IMAGES]]
+                try:
+                    with st.spinner("🔍 Reading your grocery photos..."):
+                        pantry = update_pantry(user_id, extract_ingredients(images))
+                except Exception as exc:
+                    logging.exception("Could not extract ingredients from photos")
+                    st.error(f"⚠️ Could not read your grocery photos: {exc}")
+                    pantry = get_pantry(user_id)
+            else:
+                pantry = get_pantry(user_id)
+
+            # The ingredient notes are the same for every day, so build
+            # them once and only vary the day number.
+            ingredients_note = ""
+            if pantry:
+                ingredients_note += f"\nIngredients on hand (from grocery photos): {', '.join(pantry)}"
+
+            if fridge_items.strip():
+                ingredients_note += f"\nAvailable Ingredients: {fridge_items}"
+            elif not pantry:
+                ingredients_note += "\nNo specific ingredients were provided. Use general healthy foods."
+
+            from features.llm_claude import QueueFull, get_queue_stats, stream_claude
+            from features.plan_index import get_plan_index, template_note
+
+            # Near-identical profiles (same allergies, diet, goals, equipment and
+            # ingredients) get a stored plan instead of a fresh generation.
+            profile = st.session_state["profile"]
+            match = None
+            if not fresh_plan:
+                match = get_plan_index().query(profile, plan_scope, ingredients_note)
+
+            output = ""
+            if match and match.reusable:
+                output = match.plan
+                st.subheader("📋 Your Personalized Meal Plan")
+                st.markdown(output)
+                st.caption(
+                    "⚡ Reused a plan made for a very similar profile. "
+                    "Tick “Always generate a fresh plan” for a new one."
+                )
+            elif plan_scope == "1 Day":
+                # A close but not identical match is adapted rather than rewritten.
+                template = template_note(match) if match else ""
+                prompt = context.day_plan_prompt(ingredients_note + template)
+                st.subheader("📋 Your Personalized Meal Plan")
+                timings = {}
+                queue_slot = st.empty()
+
+                def show_position(position):
+                    queue_slot.info(f"⏳ Busy right now: you're #{position} in line...")
+
+                try:
+                    output = st.write_stream(
+                        stream_claude(
+                            prompt,
+                            use_cache=not fresh_plan,
+                            timings=timings,
+                            on_wait=show_position,
+                        )
+                    )
+                except QueueFull:
+                    output = ""
+                    st.warning("The meal planner is very busy. Please try again in a minute.")
+                queue_slot.empty()
+                if timings:
+                    st.caption(
+                        f"⏱️ First words in {timings['time_to_first_token']:.1f}s · "
+                        f"full plan in {timings['total_time']:.1f}s"
+                    )
+                if output:
+                    get_plan_index().add(profile, plan_scope, ingredients_note, output)
+            elif week_job and not week_job.finished:
+                st.info("⏳ Your weekly plan is still being generated.")
+            else:
+                queue = get_queue_stats()
+                if queue["queued"]:
+                    st.caption(
+                        f"⏳ {queue['queued']} requests ahead in the queue "
+                        f"(typical wait {queue['wait_p50']:.0f}s)"
+                    )
+                from features.plan_jobs import submit_week_plan
+
+                week_job = submit_week_plan(
+                    user_id,
+                    context,
+                    ingredients_note,
+                    single_request=week_mode == WEEK_MODE_SINGLE,
+                    scope=plan_scope,
+                    profile=profile,
+                    use_cache=not fresh_plan,
+                )
+                st.session_state["week_job_id"] = week_job.job_id
+
+            if output:
+                st.session_state["last_plan"] = output
+            if output and user_id:
+                from features.history import save_meal_plan
+
+                try:
+                    save_meal_plan(user_id, output, plan_scope)
+                except Exception:
+                    logging.exception("Could not save meal plan to history")
+
+    # Weekly plans run as background jobs: show the days finished so far and
+    # poll until the rest are in. Reruns in between only re-read the job.
+    if week_job:
+        from features.weekly_plan import DAYS_PER_WEEK
+
+        plan_shown = True
+        st.subheader("📋 Your Personalized Meal Plan")
+        st.progress(
+            week_job.completed / DAYS_PER_WEEK,
+            text=f"{week_job.completed}/{DAYS_PER_WEEK} days ready",
+        )
+        for day, plan in enumerate(week_job.days, start=1):
+            if plan is not None:
+                st.markdown(f"### Day {day}\n{plan}")
+            elif day in week_job.failed:
+                st.error(f"⚠️ Could not generate the meal plan for Day {day}.")
+            elif not week_job.finished:
+                st.info(f"⏳ Generating meal plan for Day {day}...")
+
+        if week_job.status == "failed":
+            st.error(f"⚠️ Weekly plan generation failed: {week_job.error}")
+        elif week_job.finished:
+            stats = week_job.stats
+            st.caption(
+                f"⏱️ {stats['latency']:.1f}s · {stats['requests']} requests · "
+                f"{stats['input_tokens']:,} input / {stats['output_tokens']:,} output tokens · "
+                f"≈ ${stats['cost']:.3f}"
+            )
+            st.session_state["last_plan"] = week_job.output
+            # The job saved the plan from its own thread.
+            from features.history import invalidate_history_pages
+
+            invalidate_history_pages()
+        if week_job.finished:
+            del st.session_state["week_job_id"]
+
+    # Exports are rendered only when asked for; the PDF is cached by content.
+    if "last_plan" in st.session_state:
+        from features.downloads import download_meal_plan_pdf, download_meal_plan_txt
+
+        last_plan = st.session_state["last_plan"]
+        if not plan_shown:
+            with st.expander("📋 Your latest meal plan"):
+                st.markdown(last_plan)
+        col_txt, col_pdf = st.columns(2)
+        col_txt.download_button(
+            "📄 Download as TXT",
+            download_meal_plan_txt(last_plan),
+            file_name="meal_plan.txt",
+        )
+        if col_pdf.button("📄 Prepare PDF"):
+            col_pdf.download_button(
+                "⬇️ Download PDF",
+                download_meal_plan_pdf(last_plan),
+                file_name="meal_plan.pdf",
+            )
+
+    if st.session_state.get("user_id"):
+        from features.history import display_meal_plan_history
+
+        display_meal_plan_history(st.session_state["user_id"])
+
+    if week_job and not week_job.finished:
+        time.sleep(JOB_POLL_SECONDS)
+        st.rerun()
@@ -0,0 +1,170 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Serve Prometheus text format on this port when set (e.g. 9100).
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0") or 0)
+# Also log every finished span as one JSON line.
+JSON_LOGS = os.getenv("METRICS_JSON_LOGS", "").lower() in ("1", "true", "yes")
+PREFIX = "wellness_"
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_lock = threading.Lock()
+_histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+_counters = {}  # (name, labels) -> value
+_server = None
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def observe(name: str, seconds: float, **labels):
+    """Add one observation to histogram ``name`` for this label set."""
+    key = _key(name, labels)
+    with _lock:
+        series = _histograms.get(key)
+        if series is None:
+            series = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                series[i] += 1
+        series[len(BUCKETS)] += 1
+        series[-1] += seconds
+
+
+def increment(name: str, value: float = 1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+@contextmanager
+def span(name: str, **labels):
+    """
+    Time a block into the ``span_seconds`` histogram, labelled ``span=name``.
+
+    Yields a dict; anything put in it is added to the JSON log line (token
+    counts, item counts). Failed blocks are recorded with ``error="true"``.
+    """
+    attributes = {}
+    started = time.perf_counter()
+    error = False
+    try:
+        yield attributes
+    except BaseException as exc:
+        # Streamlit's rerun/stop and closed generators are control flow.
+        error = type(exc).__name__ not in (
+            "RerunException",
+            "StopException",
+            "GeneratorExit",
+        )
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        series_labels = dict(labels, error="true") if error else labels
+        observe("span_seconds", duration, span=name, **series_labels)
+        if JSON_LOGS:
+            record = {"span": name, "duration_ms": round(duration * 1000, 2)}
+            record.update(labels, error=error, **attributes)
+            logger.info(json.dumps(record, default=str))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        histograms = {key: list(series) for key, series in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = []
+    for name in sorted({name for name, _ in histograms}):
+        lines.append(f"# TYPE {PREFIX}{name} histogram")
+        for (metric, labels), series in sorted(histograms.items()):
+            if metric != name:
+                continue
+            for bound, count in zip(BUCKETS, series):
+                lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+            lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {series[len(BUCKETS)]}")
+            lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {series[-1]}")
+            lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {series[len(BUCKETS)]}")
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f"# TYPE {PREFIX}{name} counter")
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int = METRICS_PORT):
+    """Serve /metrics on a background thread; a no-op if disabled or already running."""
+    global _server
+    if not port or _server is not None:
+        return
+    with _lock:
+        if _server is not None:
+            return
+        try:
+            _server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+        except OSError:
+            logger.warning("Metrics port %s is in use; /metrics not started", port)
+            return
+    threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+    logger.info("Serving metrics on :%s/metrics", port)
+
+
+def instrument_client(client):
+    """Time every API call made through a boto3 client, by service and operation."""
+    events = client.meta.events
+    service = client.meta.service_model.service_name
+
+    def before_call(context, **kwargs):
+        context["metrics_started"] = time.perf_counter()
+
+    def after_call(context, model, http_response, parsed, **kwargs):
+        started = context.get("metrics_started")
+        if started is None:
+            return
+        observe(
+            "aws_call_seconds",
+            time.perf_counter() - started,
+            service=service,
+            operation=model.name,
+            status="error" if "Error" in parsed else "ok",
+        )
+
+    events.register(f"before-call.{service}", before_call)
+    events.register(f"after-call.{service}", after_call)
+    return client
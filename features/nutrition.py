@@ -0,0 +1,224 @@
+import datetime
+import json
+import logging
+import os
+from decimal import Decimal
+
+from boto3.dynamodb.conditions import Key
+
+from features.aws_clients import get_table
+from features.food_db import get_food_db
+from features.llm_claude import invoke_claude
+
+logger = logging.getLogger(__name__)
+
+# Partition key ``user_id``, sort key ``period`` ("day#YYYY-MM-DD" or
+# "week#YYYY-Www"). Each item holds running totals for that period.
+AGGREGATES_TABLE = os.getenv(
+    "NUTRITION_AGGREGATES_TABLE", "wellness-nutrition-aggregates"
+)
+MACROS = ("calories", "protein_g", "carbs_g", "fat_g")
+EXTRACTION_MAX_TOKENS = 200
+
+EXTRACTION_PROMPT = """
+Estimate the nutrition of this logged meal.
+Respond with JSON only, no prose and no code fences:
+{{"calories": 0, "protein_g": 0, "carbs_g": 0, "fat_g": 0}}
+
+Meal: {food}
+"""
+
+COMMENTARY_PROMPT = """
+You are a certified nutritionist. Here are the meals a user logged on {date}:
+{meals}
+
+Their totals for the day are {calories} kcal, {protein_g} g protein, {carbs_g} g carbs and {fat_g} g fat.
+Comment briefly on meal patterns, balance and one or two practical improvements. Don't recompute the totals.
+"""
+
+
+def day_period(date: str) -> str:
+    return f"day#{date}"
+
+
+def week_period(date: str) -> str:
+    year, week, _ = datetime.date.fromisoformat(date).isocalendar()
+    return f"week#{year}-W{week:02d}"
+
+
+def parse_macros(text: str) -> dict:
+    """Macro estimates from the model's JSON answer; empty if unparseable."""
+    try:
+        start, end = text.index("{"), text.rindex("}")
+        data = json.loads(text[start : end + 1])
+    except ValueError:
+        return {}
+    macros = {}
+    for name in MACROS:
+        value = data.get(name) if isinstance(data, dict) else None
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        if value >= 0:
+            macros[name] = float(value)
+    return macros if len(macros) == len(MACROS) else {}
+
+
+def extract_macros(food_description: str, use_food_db: bool = True) -> dict:
+    """
+    Structured calories/macros for one logged meal.
+
+    Runs once per entry when it is logged. Items found in the local food
+    database are computed directly; Claude only estimates the rest (or the
+    whole meal with ``use_food_db=False``, e.g. for image descriptions).
+    """
+    if not food_description.strip():
+        return {}
+    if use_food_db:
+        local = get_food_db().estimate(food_description)
+        if not local.unresolved:
+            return local.macros
+        if local.macros:
+            remote = _claude_macros(", ".join(local.unresolved))
+            if not remote:
+                return {}
+            return {name: round(local.macros[name] + remote[name], 1) for name in MACROS}
+    return _claude_macros(food_description)
+
+
+def _claude_macros(food_description: str) -> dict:
+    """Claude's estimate; identical descriptions come from the response cache."""
+    try:
+        response = invoke_claude(
+            EXTRACTION_PROMPT.format(food=food_description),
+            max_tokens=EXTRACTION_MAX_TOKENS,
+        )
+    except Exception:
+        logger.exception("Macro extraction failed")
+        return {}
+    return parse_macros(response.text)
+
+
+def _to_decimal(value: float) -> Decimal:
+    return Decimal(str(round(value, 1)))
+
+
+def record_entry(user_id, date: str, macros: dict, entry_id: str):
+    """
+    Add one entry's macros to its day and week totals.
+
+    Each period item keeps the ids of the entries it has counted, and the
+    ADD is conditional on ``entry_id`` not being among them, so a retried or
+    replayed call never counts an entry twice.
+    """
+    values = {":one": 1, ":ids": {entry_id}, ":id": entry_id}
+    actions = ["entry_count :one", "entry_ids :ids"]
+    for name in MACROS:
+        if name in macros:
+            values[f":{name}"] = _to_decimal(macros[name])
+            actions.append(f"{name} :{name}")
+    if len(actions) == 2:
+        # Still counted, so cached commentary is refreshed for this entry.
+        values[":unestimated"] = 1
+        actions.append("unestimated :unestimated")
+
+    table = get_table(AGGREGATES_TABLE)
+    for period in (day_period(date), week_period(date)):
+        try:
+            table.update_item(
+                Key={"user_id": user_id, "period": period},
+                UpdateExpression="ADD " + ", ".join(actions),
+                ConditionExpression="NOT contains(entry_ids, :id)",
+                ExpressionAttributeValues=values,
+            )
+        except table.meta.client.exceptions.ConditionalCheckFailedException:
+            pass  # already counted
+
+
+def totals_from_logs(logs, totals=None) -> dict:
+    """
+    ``totals`` (or empty totals) plus the macros stored on each log item.
+
+    Used for days logged before aggregates were kept, and for entries whose
+    aggregate update hasn't run yet.
+    """
+    if totals is None:
+        totals = {"commentary": None, "commentary_entries": -1}
+        totals.update(_as_totals({}))
+    totals = dict(totals)
+    for log in logs:
+        totals["entry_count"] += 1
+        if all(name in log for name in MACROS):
+            for name in MACROS:
+                totals[name] += float(log[name])
+        else:
+            totals["unestimated"] += 1
+    return totals
+
+
+def _as_totals(item) -> dict:
+    totals = {name: float(item.get(name, 0)) for name in MACROS}
+    totals["entry_count"] = int(item.get("entry_count", 0))
+    totals["unestimated"] = int(item.get("unestimated", 0))
+    return totals
+
+
+def get_totals(user_id, period: str):
+    """Totals for one period, or None if nothing was logged in it."""
+    item = get_table(AGGREGATES_TABLE).get_item(
+        Key={"user_id": user_id, "period": period}
+    ).get("Item")
+    if not item:
+        return None
+    totals = _as_totals(item)
+    totals["commentary"] = item.get("commentary")
+    totals["commentary_entries"] = int(item.get("commentary_entries", -1))
+    return totals
+
+
+def get_daily_trend(user_id, start_date: str, end_date: str) -> dict:
+    """Day totals between two inclusive dates, keyed by ``YYYY-MM-DD``."""
+    query = {
+        "KeyConditionExpression": Key("user_id").eq(user_id)
+        & Key("period").between(day_period(start_date), day_period(end_date)),
+        "ProjectionExpression": "#period, " + ", ".join(MACROS),
+        "ExpressionAttributeNames": {"#period": "period"},
+    }
+    table = get_table(AGGREGATES_TABLE)
+    trend = {}
+    while True:
+        response = table.query(**query)
+        for item in response.get("Items", []):
+            trend[item["period"][len("day#"):]] = {
+                name: float(item.get(name, 0)) for name in MACROS
+            }
+        last_key = response.get("LastEvaluatedKey")
+        if not last_key:
+            return trend
+        query["ExclusiveStartKey"] = last_key
+
+
+def commentary_prompt(date: str, day_logs, totals: dict) -> str:
+    meals = "\n".join(
+        f"Time: {log.get('time', '[Unknown time]')} — {log.get('food', '[Image/Audio Upload]')}"
+        for log in day_logs
+    )
+    return COMMENTARY_PROMPT.format(
+        date=date, meals=meals, **{name: round(totals[name]) for name in MACROS}
+    )
+
+
+def cached_commentary(totals):
+    """Stored commentary for a day, if no entry was logged since it was written."""
+    if not totals or not totals.get("commentary"):
+        return None
+    if totals["commentary_entries"] != totals["entry_count"]:
+        return None
+    return totals["commentary"]
+
+
+def save_commentary(user_id, date: str, text: str, entry_count: int):
+    get_table(AGGREGATES_TABLE).update_item(
+        Key={"user_id": user_id, "period": day_period(date)},
+        UpdateExpression="SET commentary = :text, commentary_entries = :count",
+        ExpressionAttributeValues={":text": text, ":count": entry_count},
+    )
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+MAX_IMAGES = 3
+EXTRACTION_MAX_TOKENS = 800
+CACHE_SIZE = 128
+
+EXTRACTION_PROMPT = """
+These photos show a user's groceries: a fridge, pantry shelves or a grocery receipt.
+List every food ingredient you can identify across all of the photos.
+Respond with JSON only, no prose and no code fences:
+{"ingredients": ["ingredient name", "..."]}
+Use short generic names (e.g. "greek yogurt", "spinach", "chicken breast"), without brands or quantities.
+"""
+
+_LEADING_WORDS = re.compile(r"^(?:a|an|some|fresh|organic|pack of|bag of|box of)\s+")
+_QUANTITY = re.compile(r"^[\d.,/]+\s*(?:x|kg|g|lb|lbs|oz|ml|l|pcs)?\s+")
+
+_extractions = OrderedDict()
+# Pantries live in this process only: a restart, or another app instance,
+# starts empty until the user uploads photos again.
+_pantries = {}
+_lock = threading.Lock()
+
+
+def normalize_ingredient(name: str) -> str:
+    name = re.sub(r"[^\w\s'-]", " ", name.lower())
+    name = re.sub(r"\s+", " ", name).strip()
+    name = _QUANTITY.sub("", name)
+    name = _LEADING_WORDS.sub("", name)
+    # Naive singular form so "eggs"/"egg" and "tomatoes"/"tomato" merge.
+    if name.endswith("ies") and len(name) > 4:
+        name = name[:-3] + "y"
+    elif name.endswith("oes"):
+        name = name[:-2]
+    elif name.endswith("s") and not name.endswith(("ss", "us")) and len(name) > 3:
+        name = name[:-1]
+    return name
+
+
+def parse_ingredients(text: str) -> list:
+    """Normalised, de-duplicated ingredient names from the model's answer."""
+    try:
+        start, end = text.index("{"), text.rindex("}")
+        names = json.loads(text[start : end + 1]).get("ingredients", [])
+    except ValueError:
+        # Fall back to one ingredient per line/comma.
+        names = re.split(r"[\n,]", text)
+    cleaned = (normalize_ingredient(str(n)) for n in names if isinstance(n, str))
+    return sorted({name for name in cleaned if name})
+
+
+def images_key(images) -> str:
+    digest = hashlib.sha256()
+    for data in images:
+        digest.update(hashlib.sha256(data).digest())
+    return digest.hexdigest()
+
+
+def extract_ingredients(images) -> list:
+    """
+    Identify ingredients across up to three photos in one vision request.
+
+    Results are cached by the images' content hashes, so re-generating a plan
+    with the same uploads doesn't call the model again.
+    """
+    images = list(images)[:MAX_IMAGES]
+    if not images:
+        return []
+    key = images_key(images)
+    with _lock:
+        if key in _extractions:
+            _extractions.move_to_end(key)
+            return list(_extractions[key])
+
+    # Imported here so the meal plan page can show the pantry without boto3.
+    from features.llm_claude import invoke_claude
+
+    response = invoke_claude(
+        EXTRACTION_PROMPT, images=images, max_tokens=EXTRACTION_MAX_TOKENS
+    )
+    ingredients = parse_ingredients(response.text)
+
+    with _lock:
+        _extractions[key] = ingredients
+        while len(_extractions) > CACHE_SIZE:
+            _extractions.popitem(last=False)
+    return list(ingredients)
+
+
+def get_pantry(user_id) -> list:
+    with _lock:
+        pantry = _pantries.get(user_id)
+        return list(pantry["ingredients"]) if pantry else []
+
+
+def update_pantry(user_id, ingredients) -> list:
+    """Merge newly seen ingredients into the user's pantry inventory."""
+    with _lock:
+        pantry = _pantries.setdefault(user_id, {"ingredients": []})
+        pantry["ingredients"] = sorted(set(pantry["ingredients"]) | set(ingredients))
+        pantry["updated_at"] = time.time()
+        return list(pantry["ingredients"])
+
+
+def clear_pantry(user_id):
+    with _lock:
+        _pantries.pop(user_id, None)
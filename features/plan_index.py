@@ -0,0 +1,176 @@
+import os
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from features.calculations import ACTIVITY_MULTIPLIERS
+
+# Distances are in "units": one unit is a numeric field's scale (e.g. 5 kg),
+# and each differing category costs about 1.4. A stored plan within
+# REUSE_DISTANCE is shown as-is; within TEMPLATE_DISTANCE it is sent to Claude
+# as a template to adapt.
+REUSE_DISTANCE = float(os.getenv("PLAN_REUSE_DISTANCE", "0.5"))
+TEMPLATE_DISTANCE = float(os.getenv("PLAN_TEMPLATE_DISTANCE", "1.5"))
+# Plans kept per partition (same hard filters); the oldest are overwritten.
+PARTITION_SIZE = int(os.getenv("PLAN_INDEX_PARTITION_SIZE", "20000"))
+
+# (center, scale) per numeric field. Centering keeps the float32 vectors small,
+# so distances computed from cached norms stay precise.
+NUMERIC_FIELDS = {
+    "age": (40.0, 10.0),
+    "height": (170.0, 10.0),
+    "weight": (75.0, 5.0),
+    "body_fat": (25.0, 5.0),
+    "tdee": (2200.0, 150.0),
+}
+GENDERS = ("Female", "Male", "Other")
+ACTIVITY_LEVELS = tuple(ACTIVITY_MULTIPLIERS)
+DIMENSIONS = len(NUMERIC_FIELDS) + len(GENDERS) + len(ACTIVITY_LEVELS)
+
+TEMPLATE_NOTE = """
+Here is a plan written for a user with an almost identical profile. Keep its
+structure and meals, and only change portions, meals or macros where this
+user's details call for it:
+
+{plan}
+"""
+
+
+@dataclass(frozen=True)
+class PlanMatch:
+    plan: str
+    distance: float
+
+    @property
+    def reusable(self) -> bool:
+        return self.distance <= REUSE_DISTANCE
+
+
+def _normalize_list(text) -> tuple:
+    return tuple(sorted({item.strip().lower() for item in str(text or "").split(",") if item.strip()}))
+
+
+def hard_filter_key(profile: dict, scope: str, ingredients_note: str) -> tuple:
+    """
+    Fields a reused plan must match exactly.
+
+    Allergies and diet type are safety constraints, not preferences, and a plan
+    only fits the goals (including custom goal text), equipment, free-text
+    details and ingredients it was made for.
+    """
+    return (
+        scope,
+        _normalize_list(profile.get("allergies")),
+        str(profile.get("diet_type", "")).lower(),
+        _normalize_list(profile.get("goal")),
+        _normalize_list(profile.get("cooking_equipment")),
+        str(profile.get("goal_details", "")).strip().lower(),
+        ingredients_note.strip().lower(),
+    )
+
+
+def profile_vector(profile: dict) -> np.ndarray:
+    """Scaled numeric fields followed by one-hot gender and activity level."""
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for i, (name, (center, scale)) in enumerate(NUMERIC_FIELDS.items()):
+        vector[i] = (float(profile.get(name) or 0) - center) / scale
+    offset = len(NUMERIC_FIELDS)
+    for values, value in (
+        (GENDERS, profile.get("gender")),
+        (ACTIVITY_LEVELS, profile.get("activity_level")),
+    ):
+        if value in values:
+            vector[offset + values.index(value)] = 1.0
+        offset += len(values)
+    return vector
+
+
+class _Partition:
+    """Ring buffer of profile vectors and their plans."""
+
+    def __init__(self, size):
+        self.vectors = np.zeros((min(size, 64), DIMENSIONS), dtype=np.float32)
+        self.norms = np.zeros(len(self.vectors), dtype=np.float32)  # squared
+        self.plans = []
+        self.size = size
+        self.count = 0
+
+    def add(self, vector, plan):
+        slot = self.count % self.size
+        if slot >= len(self.vectors):
+            grown = np.zeros((min(self.size, len(self.vectors) * 2), DIMENSIONS), dtype=np.float32)
+            grown[: len(self.vectors)] = self.vectors
+            self.vectors = grown
+            self.norms = np.resize(self.norms, len(grown))
+        self.vectors[slot] = vector
+        self.norms[slot] = vector @ vector
+        if slot < len(self.plans):
+            self.plans[slot] = plan
+        else:
+            self.plans.append(plan)
+        self.count += 1
+
+    def nearest(self, vector):
+        # |a - b|^2 = |a|^2 - 2 a.b + |b|^2, with |a|^2 kept per row.
+        count = len(self.plans)
+        distances = self.norms[:count] - 2 * (self.vectors[:count] @ vector)
+        best = int(np.argmin(distances))
+        squared = float(distances[best]) + float(vector @ vector)
+        return self.plans[best], max(squared, 0.0) ** 0.5
+
+
+class PlanIndex:
+    """
+    Nearest-neighbour lookup of generated plans by profile similarity.
+
+    Profiles are partitioned by ``hard_filter_key``; within a partition the
+    closest vector is found by brute force, which takes about a millisecond
+    for 100k profiles.
+    """
+
+    def __init__(self, partition_size=PARTITION_SIZE):
+        self.partition_size = partition_size
+        self._partitions = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(p.plans) for p in self._partitions.values())
+
+    def add(self, profile: dict, scope: str, ingredients_note: str, plan: str):
+        key = hard_filter_key(profile, scope, ingredients_note)
+        vector = profile_vector(profile)
+        with self._lock:
+            partition = self._partitions.get(key)
+            if partition is None:
+                partition = self._partitions[key] = _Partition(self.partition_size)
+            partition.add(vector, plan)
+
+    def query(
+        self, profile: dict, scope: str, ingredients_note: str, max_distance=TEMPLATE_DISTANCE
+    ) -> Optional[PlanMatch]:
+        """Closest stored plan within ``max_distance``, or None."""
+        key = hard_filter_key(profile, scope, ingredients_note)
+        vector = profile_vector(profile)
+        with self._lock:
+            partition = self._partitions.get(key)
+            if partition is None or not partition.plans:
+                return None
+            plan, distance = partition.nearest(vector)
+        if distance > max_distance:
+            return None
+        return PlanMatch(plan, distance)
+
+
+_index = PlanIndex()
+
+
+def get_plan_index() -> PlanIndex:
+    return _index
+
+
+def template_note(match: PlanMatch) -> str:
+    """Prompt addition asking Claude to adapt a near match instead of starting over."""
+    return TEMPLATE_NOTE.format(plan=match.plan)
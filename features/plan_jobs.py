@@ -0,0 +1,170 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from features.history import store_meal_plan
+from features.llm_claude import call_claude_many, summarize_usage
+from features.metrics import span
+from features.plan_index import get_plan_index
+from features.weekly_plan import DAYS_PER_WEEK, generate_week_plan, render_day_markdown
+
+logger = logging.getLogger(__name__)
+
+# Weekly plans are generated off the Streamlit script thread, so reruns and
+# page switches don't cancel them. Finished jobs are kept for an hour.
+JOB_WORKERS = int(os.getenv("PLAN_JOB_WORKERS", "4"))
+JOB_TTL_SECONDS = 3600
+FAILED_DAY_TEXT = "_Meal plan for this day could not be generated._"
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="plan-job")
+_jobs = {}
+_running_by_key = {}
+_lock = threading.Lock()
+
+
+@dataclass
+class WeekPlanJob:
+    job_id: str
+    key: str
+    user_id: Optional[str]
+    scope: str
+    days: List[Optional[str]] = field(default_factory=lambda: [None] * DAYS_PER_WEEK)
+    failed: set = field(default_factory=set)
+    status: str = "queued"  # queued -> running -> done | failed
+    stats: dict = field(default_factory=dict)
+    error: str = ""
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    @property
+    def completed(self) -> int:
+        return sum(1 for day in self.days if day is not None) + len(self.failed)
+
+    @property
+    def output(self) -> str:
+        return "".join(
+            f"\n\n### Day {i}\n{plan if plan is not None else FAILED_DAY_TEXT}"
+            for i, plan in enumerate(self.days, start=1)
+        )
+
+
+def _job_key(user_id, context, ingredients_note, single_request):
+    digest = hashlib.sha256()
+    for part in (str(user_id), context.user_info, ingredients_note, str(single_request)):
+        digest.update(part.encode("utf-8") + b"\0")
+    return digest.hexdigest()
+
+
+def _run_per_day(job, context, ingredients_note, use_cache):
+    prompts = [
+        context.week_day_prompt(day, ingredients_note)
+        for day in range(1, DAYS_PER_WEEK + 1)
+    ]
+    started = time.perf_counter()
+    responses = []
+    for index, response, error in call_claude_many(prompts, use_cache=use_cache):
+        if error is not None:
+            logger.warning("Day %s meal plan failed: %s", index + 1, error)
+            job.failed.add(index + 1)
+            continue
+        responses.append(response)
+        job.days[index] = response.text.strip()
+    job.stats = summarize_usage(responses)
+    job.stats["latency"] = time.perf_counter() - started
+
+
+def _run_single_request(job, context, ingredients_note, use_cache):
+    week_days, job.stats = generate_week_plan(context, ingredients_note, use_cache)
+    for number, day in week_days.items():
+        if day:
+            job.days[number - 1] = render_day_markdown(day)
+        else:
+            job.failed.add(number)
+
+
+def _run(job, context, ingredients_note, single_request, profile, use_cache):
+    job.status = "running"
+    try:
+        with span("week_plan.job", single_request=single_request):
+            if single_request:
+                _run_single_request(job, context, ingredients_note, use_cache)
+            else:
+                _run_per_day(job, context, ingredients_note, use_cache)
+    except Exception as exc:
+        logger.exception("Weekly plan job %s failed", job.job_id)
+        job.error = str(exc)
+        job.status = "failed"
+    else:
+        # Saved before the job reports done, so the page's history refresh
+        # sees it; a storage error doesn't discard the generated days.
+        if job.user_id and len(job.failed) < DAYS_PER_WEEK:
+            try:
+                store_meal_plan(job.user_id, job.output, job.scope)
+            except Exception:
+                logger.exception("Could not save weekly plan %s to history", job.job_id)
+        if profile and not job.failed:
+            try:
+                get_plan_index().add(profile, job.scope, ingredients_note, job.output)
+            except Exception:
+                logger.exception("Could not add weekly plan %s to the plan index", job.job_id)
+        job.status = "done"
+    finally:
+        job.finished_at = time.time()
+        with _lock:
+            if _running_by_key.get(job.key) == job.job_id:
+                del _running_by_key[job.key]
+
+
+def _prune():
+    cutoff = time.time() - JOB_TTL_SECONDS
+    for job_id in [
+        job_id
+        for job_id, job in _jobs.items()
+        if job.finished_at is not None and job.finished_at < cutoff
+    ]:
+        del _jobs[job_id]
+
+
+def submit_week_plan(
+    user_id,
+    context,
+    ingredients_note,
+    single_request=False,
+    scope="7 Days (Week)",
+    profile=None,
+    use_cache=True,
+) -> WeekPlanJob:
+    """
+    Start generating a weekly plan in the background and return its job.
+
+    If the same user already has an identical request running, that job is
+    returned instead of starting a second one. With ``profile``, a complete
+    plan is added to the plan reuse index. ``use_cache=False`` asks Claude
+    for every day again instead of reusing cached responses.
+    """
+    key = _job_key(user_id, context, ingredients_note, single_request)
+    with _lock:
+        _prune()
+        running = _jobs.get(_running_by_key.get(key))
+        if running is not None:
+            return running
+        job = WeekPlanJob(job_id=uuid.uuid4().hex, key=key, user_id=user_id, scope=scope)
+        _jobs[job.job_id] = job
+        _running_by_key[key] = job.job_id
+    _executor.submit(_run, job, context, ingredients_note, single_request, profile, use_cache)
+    return job
+
+
+def get_job(job_id) -> Optional[WeekPlanJob]:
+    with _lock:
+        return _jobs.get(job_id)
@@ -0,0 +1,136 @@
+from dataclasses import dataclass
+
+import streamlit as st
+
+from features.calculations import (
+    calculate_bmi,
+    calculate_bmr,
+    calculate_tdee,
+    goal_calorie_range,
+    interpret_bmi,
+)
+
+# Form fields that define a profile; derived stats and user_id are excluded so
+# the same answers always map to the same cache entry.
+PROFILE_FIELDS = (
+    "age",
+    "gender",
+    "height",
+    "weight",
+    "body_fat",
+    "activity_level",
+    "allergies",
+    "diet_type",
+    "cooking_equipment",
+    "goal",
+    "goal_details",
+)
+
+DAY_PLAN_HEADER = """
+You are a certified nutritionist and wellness coach. Create a 1-day meal plan.
+Include breakfast, lunch, dinner, and 1-2 snacks with estimated portion sizes and macronutrients (calories, protein, carbs, fat).
+"""
+
+WEEK_DAY_HEADER = """
+You are a certified nutritionist and wellness coach. Create a meal plan for **Day {day}**.
+Include breakfast, lunch, dinner, and 1–2 snacks with estimated portion sizes and macronutrients PER MEAL (calories, protein, carbs, fat). Only include calories and macronutrients per meal.
+Try to keep it precise yet informative.
+"""
+
+
+@dataclass(frozen=True)
+class ProfileContext:
+    """Everything derived from one profile: stats, strategy text and prompt blocks."""
+
+    bmi: float
+    bmr: int
+    tdee: int
+    target_low: int
+    target_high: int
+    stats_markdown: str
+    strategy_markdown: str
+    summary_markdown: str
+    user_info: str
+
+    def day_plan_prompt(self, extra: str = "") -> str:
+        return DAY_PLAN_HEADER + self.user_info + extra
+
+    def week_day_prompt(self, day: int, extra: str = "") -> str:
+        return WEEK_DAY_HEADER.format(day=day) + self.user_info + extra
+
+
+def _strategy_markdown(goal, tdee, target_low, target_high):
+    goal_lower = goal.lower()
+    if "lose weight" in goal_lower:
+        return f"""
+To lose weight, aim to eat **10–25% fewer calories than your TDEE**:
+- Target intake: `{target_low}–{target_high} kcal/day`
+- This creates a safe calorie deficit for fat loss while preserving muscle.
+- Focus on **high protein**, **fiber-rich** foods, and hydration.
+"""
+    if "gain muscle" in goal_lower:
+        return f"""
+To gain lean muscle, aim to eat **10–20% more than your TDEE**:
+- Target intake: `{target_low}–{target_high} kcal/day`
+- Prioritize **protein**, **resistance training**, and **meal timing**.
+"""
+    if "improve metabolic markers" in goal_lower:
+        return f"""
+Stabilizing blood sugar and improving markers means:
+- Prioritize **complex carbs**, **healthy fats**, and **moderate calories**
+- Aim to stay close to your TDEE: `{tdee} kcal/day`
+- Avoid extreme deficits or surpluses.
+"""
+    return "Stick to your **TDEE range** for maintenance and adjust as needed."
+
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def _build_profile_context(profile_items: tuple) -> ProfileContext:
+    p = dict(profile_items)
+    bmi = calculate_bmi(p["weight"], p["height"])
+    bmr = calculate_bmr(p["weight"], p["height"], p["age"], p["gender"])
+    tdee = calculate_tdee(bmr, p["activity_level"])
+    target_low, target_high = goal_calorie_range(tdee, p["goal"])
+
+    stats_markdown = f"""
+### 📊 Your Body Stats
+- **BMI**: `{bmi}` – {interpret_bmi(bmi)}
+- **BMR**: `{bmr} kcal/day` – Basal calories your body needs at rest
+- **TDEE**: `{tdee} kcal/day` – Estimated daily calories needed with your activity level
+"""
+    user_info = f"""User Info:
+- Age: {p['age']} years
+- Gender: {p['gender']}
+- Height: {p['height']} cm
+- Weight: {p['weight']} kg
+- Body Fat: {p['body_fat']}%
+- Activity Level: {p['activity_level']}
+- Allergies/Intolerances: {p['allergies']}
+- Diet Type: {p['diet_type']}
+- Cooking Equipment: {p['cooking_equipment']}
+- Goal: {p['goal']}
+- Details: {p['goal_details']}
+- BMI: {bmi}
+- BMR: {bmr} kcal/day
+- TDEE: {tdee} kcal/day
+"""
+    return ProfileContext(
+        bmi=bmi,
+        bmr=bmr,
+        tdee=tdee,
+        target_low=target_low,
+        target_high=target_high,
+        stats_markdown=stats_markdown,
+        strategy_markdown=_strategy_markdown(p["goal"], tdee, target_low, target_high),
+        summary_markdown=f"**BMI**: {bmi} | **BMR**: {bmr} kcal/day | **TDEE**: {tdee} kcal/day",
+        user_info=user_info,
+    )
+
+
+def get_profile_context(profile: dict) -> ProfileContext:
+    """Memoised context for a profile; computed once per distinct set of answers."""
+    return _build_profile_context(tuple((field, profile[field]) for field in PROFILE_FIELDS))
+
+
+def clear_profile_context_cache():
+    _build_profile_context.clear()
@@ -0,0 +1,191 @@
+import json
+import time
+
+from features.llm_claude import (
+    PRIORITY_BATCH,
+    call_claude_many,
+    invoke_claude,
+    summarize_usage,
+)
+
+DAYS_PER_WEEK = 7
+WEEK_MAX_TOKENS = 4096
+DAY_MAX_TOKENS = 900
+
+MEAL_FIELDS = {
+    "meal": str,
+    "name": str,
+    "portion": str,
+    "calories": (int, float),
+    "protein_g": (int, float),
+    "carbs_g": (int, float),
+    "fat_g": (int, float),
+}
+
+# Shown to the model verbatim; parse_week_plan enforces the same shape.
+WEEK_PLAN_SCHEMA = """{
+  "days": [
+    {
+      "day": 1,
+      "meals": [
+        {
+          "meal": "Breakfast | Lunch | Dinner | Snack",
+          "name": "dish name",
+          "portion": "portion sizes, e.g. 2 eggs, 1 slice toast",
+          "calories": 0,
+          "protein_g": 0,
+          "carbs_g": 0,
+          "fat_g": 0
+        }
+      ]
+    }
+  ]
+}"""
+
+WEEK_HEADER = f"""
+You are a certified nutritionist and wellness coach. Create a 7-day meal plan (days 1 to 7).
+Each day has breakfast, lunch, dinner, and 1–2 snacks with estimated portion sizes and calories/macronutrients PER MEAL.
+Respond with JSON only, no prose and no code fences, matching this schema:
+{WEEK_PLAN_SCHEMA}
+"""
+
+DAY_HEADER = """
+You are a certified nutritionist and wellness coach. Create the meal plan for **Day {day}** of a 7-day plan.
+Include breakfast, lunch, dinner, and 1–2 snacks with estimated portion sizes and calories/macronutrients PER MEAL.
+Respond with JSON only, no prose and no code fences, as one element of "days" in this schema:
+{schema}
+"""
+
+
+def _extract_json(text: str):
+    start = text.find("{")
+    end = text.rfind("}")
+    if start == -1 or end < start:
+        raise ValueError("no JSON object in response")
+    return json.loads(text[start : end + 1])
+
+
+def _salvage_days(text: str):
+    """Decode day objects one by one, keeping those before a truncation point."""
+    decoder = json.JSONDecoder()
+    start = text.find("[", text.find('"days"'))
+    if start == -1:
+        return []
+    days = []
+    position = start + 1
+    while True:
+        while position < len(text) and text[position] in " \t\r\n,":
+            position += 1
+        if position >= len(text) or text[position] != "{":
+            return days
+        try:
+            day, position = decoder.raw_decode(text, position)
+        except ValueError:
+            return days
+        days.append(day)
+
+
+def _valid_day(day) -> bool:
+    if not isinstance(day, dict) or not isinstance(day.get("meals"), list):
+        return False
+    if not day["meals"]:
+        return False
+    for meal in day["meals"]:
+        if not isinstance(meal, dict):
+            return False
+        for field, kind in MEAL_FIELDS.items():
+            value = meal.get(field)
+            if not isinstance(value, kind) or isinstance(value, bool):
+                return False
+    return True
+
+
+def parse_week_plan(text: str):
+    """
+    Parse a weekly JSON plan.
+
+    Returns ``(days, failed)``: a dict of valid day number -> day object, and
+    the sorted day numbers that were missing or malformed.
+    """
+    days = {}
+    try:
+        data = _extract_json(text)
+        candidates = data.get("days", []) if isinstance(data, dict) else []
+    except ValueError:
+        # Usually a response cut off at max_tokens; keep the complete days.
+        candidates = _salvage_days(text)
+
+    for day in candidates:
+        number = day.get("day") if isinstance(day, dict) else None
+        if isinstance(number, int) and 1 <= number <= DAYS_PER_WEEK and _valid_day(day):
+            days.setdefault(number, day)
+
+    failed = [n for n in range(1, DAYS_PER_WEEK + 1) if n not in days]
+    return days, failed
+
+
+def parse_day_plan(text: str, number: int):
+    try:
+        day = _extract_json(text)
+    except ValueError:
+        return None
+    if isinstance(day, dict) and "days" in day and day["days"]:
+        day = day["days"][0]
+    if not _valid_day(day):
+        return None
+    return dict(day, day=number)
+
+
+def render_day_markdown(day: dict) -> str:
+    lines = []
+    for meal in day["meals"]:
+        lines.append(f"**{meal['meal']}**: {meal['name']} ({meal['portion']})")
+        lines.append(
+            f"- {round(meal['calories'])} kcal · protein {round(meal['protein_g'])} g · "
+            f"carbs {round(meal['carbs_g'])} g · fat {round(meal['fat_g'])} g"
+        )
+    total = sum(meal["calories"] for meal in day["meals"])
+    lines.append(f"\n_Day total: {round(total)} kcal_")
+    return "\n".join(lines)
+
+
+def generate_week_plan(context, ingredients_note: str = "", use_cache: bool = True):
+    """
+    Generate the whole week in one structured request.
+
+    Days that fail to parse are regenerated individually (in parallel). Returns
+    ``(days, stats)`` where ``days`` maps day number -> parsed day (or None if
+    it could not be generated) and ``stats`` has requests, tokens, cost and
+    wall-clock latency for comparison with per-day mode. ``use_cache=False``
+    skips the response cache for every request.
+    """
+    started = time.perf_counter()
+    prompt = WEEK_HEADER + context.user_info + ingredients_note
+    responses = [
+        invoke_claude(
+            prompt, max_tokens=WEEK_MAX_TOKENS, priority=PRIORITY_BATCH, use_cache=use_cache
+        )
+    ]
+    days, failed = parse_week_plan(responses[0].text)
+
+    if failed:
+        day_prompts = [
+            DAY_HEADER.format(day=number, schema=WEEK_PLAN_SCHEMA)
+            + context.user_info
+            + ingredients_note
+            for number in failed
+        ]
+        for index, response, error in call_claude_many(
+            day_prompts, max_tokens=DAY_MAX_TOKENS, use_cache=use_cache
+        ):
+            if error is not None:
+                continue
+            responses.append(response)
+            day = parse_day_plan(response.text, failed[index])
+            if day is not None:
+                days[failed[index]] = day
+
+    stats = summarize_usage(responses)
+    stats["latency"] = time.perf_counter() - started
+    stats["regenerated_days"] = failed
+    return {n: days.get(n) for n in range(1, DAYS_PER_WEEK + 1)}, stats
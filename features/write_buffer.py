@@ -0,0 +1,283 @@
+import atexit
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from features.aws_clients import get_dynamodb
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 25  # BatchWriteItem limit
+FLUSH_INTERVAL_SECONDS = float(os.getenv("DYNAMO_FLUSH_INTERVAL", "1.0"))
+SYNC_WRITES = os.getenv("DYNAMO_SYNC_WRITES", "").lower() in ("1", "true", "yes")
+# Items DynamoDB rejects outright (not throttling) are appended here as JSON
+# lines instead of being retried forever.
+DEAD_LETTER_PATH = os.getenv("DYNAMO_DEAD_LETTER_PATH", "dynamo_dead_letters.jsonl")
+RETRYABLE_ERROR_CODES = {
+    "ProvisionedThroughputExceededException",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+    "InternalServerError",
+    "ServiceUnavailable",
+}
+
+
+class UnprocessedItemsError(RuntimeError):
+    """Items were still throttled after every retry."""
+
+
+def is_transient(exc: Exception) -> bool:
+    """Whether a failed write may succeed if simply tried again later."""
+    from botocore.exceptions import ClientError, ConnectionError, HTTPClientError
+
+    if isinstance(exc, (UnprocessedItemsError, ConnectionError, HTTPClientError)):
+        return True
+    if isinstance(exc, ClientError):
+        return exc.response.get("Error", {}).get("Code") in RETRYABLE_ERROR_CODES
+    return False
+
+
+class WriteBuffer:
+    """
+    Write-behind buffer for DynamoDB puts.
+
+    Items are queued and written by a background thread in ``BatchWriteItem``
+    calls of up to 25, either when a full batch is waiting or every
+    ``flush_interval`` seconds. Puts of the same key are collapsed within a
+    batch (the last one wins), which BatchWriteItem would otherwise reject.
+    ``UnprocessedItems`` are retried with jittered exponential backoff.
+
+    Throttling and connection errors keep the batch queued for the next
+    flush. Any other error is permanent: the batch is retried item by item and
+    the items DynamoDB still rejects go to the dead-letter file, so one bad
+    item can't block later writes.
+
+    Pass ``sync=True`` to ``put`` (or set DYNAMO_SYNC_WRITES) to write the
+    item before returning; failures are then raised to the caller.
+    ``on_written`` callbacks run once the item is stored (never for dead
+    letters); until then the item is still listed by ``pending``.
+    """
+
+    def __init__(
+        self,
+        table_name="wellness-app",
+        flush_interval=FLUSH_INTERVAL_SECONDS,
+        max_retries=8,
+        base_delay=0.05,
+    ):
+        self.table_name = table_name
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self._queue = []
+        self._in_flight = []
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._key_names = None
+        self._callbacks = {}  # id(item) -> [on_written callbacks]
+        self.dead_letters = 0
+        self._thread = threading.Thread(
+            target=self._run, name=f"write-buffer-{table_name}", daemon=True
+        )
+        self._thread.start()
+
+    def put(self, item: dict, sync: bool = SYNC_WRITES, on_written=None):
+        if sync:
+            self._put_sync(item)
+            if on_written:
+                self._run_callbacks([on_written], item)
+            return
+        with self._cond:
+            if on_written:
+                self._callbacks.setdefault(id(item), []).append(on_written)
+            self._queue.append(item)
+            if len(self._queue) >= MAX_BATCH_SIZE:
+                self._cond.notify()
+        if self._closed:
+            self.flush()
+
+    def _put_sync(self, item):
+        with self._flush_lock:
+            self._load_key_names()
+            key = self._key(item)
+            superseded = []
+            if key is not None:
+                with self._cond:
+                    # A queued put of the same key would overwrite this one later.
+                    superseded = [queued for queued in self._queue if self._key(queued) == key]
+                    self._queue = [queued for queued in self._queue if self._key(queued) != key]
+            try:
+                self._write_batch([item])
+            except Exception:
+                with self._cond:
+                    self._queue[:0] = superseded
+                raise
+            self._written(superseded)
+
+    def pending(self, predicate=None) -> list:
+        """Items accepted but not yet confirmed written, for read-your-writes."""
+        with self._cond:
+            items = self._in_flight + self._queue
+        if predicate is None:
+            return list(items)
+        return [item for item in items if predicate(item)]
+
+    def flush(self):
+        """
+        Write everything queued so far before returning.
+
+        Stops early, leaving the rest queued, on a throttling or connection
+        error.
+        """
+        with self._flush_lock:
+            self._load_key_names()
+            while True:
+                with self._cond:
+                    if not self._queue:
+                        return
+                    self._in_flight = self._take_batch()
+                batch = self._in_flight
+                try:
+                    self._write_batch(batch)
+                    self._written(batch)
+                    retry = []
+                except Exception as exc:
+                    if is_transient(exc):
+                        logger.warning("Batch write to %s throttled or failed; will retry", self.table_name)
+                        retry = batch
+                    else:
+                        logger.warning("Batch write to %s rejected; writing items one by one", self.table_name)
+                        retry = self._write_one_by_one(batch)
+                with self._cond:
+                    # Keep transiently failed items for the next flush.
+                    self._queue[:0] = retry
+                    self._in_flight = []
+                if retry:
+                    return
+
+    def _load_key_names(self):
+        """Read the table's key attributes once; without them keys aren't collapsed."""
+        if self._key_names is None:
+            try:
+                schema = get_dynamodb().Table(self.table_name).key_schema
+                self._key_names = tuple(key["AttributeName"] for key in schema)
+            except Exception:
+                logger.warning("Could not read the key schema of %s", self.table_name, exc_info=True)
+
+    def _key(self, item):
+        if not self._key_names:
+            return None
+        return tuple(item.get(name) for name in self._key_names)
+
+    def _pop_callbacks(self, item):
+        with self._cond:
+            return self._callbacks.pop(id(item), [])
+
+    def _run_callbacks(self, callbacks, item):
+        for callback in callbacks:
+            try:
+                callback(item)
+            except Exception:
+                logger.exception("on_written callback for %s failed", self.table_name)
+
+    def _written(self, items):
+        for item in items:
+            self._run_callbacks(self._pop_callbacks(item), item)
+
+    def _take_batch(self):
+        """Pop up to 25 distinct keys off the queue; later puts of a key win."""
+        batch = {}
+        while self._queue and (
+            len(batch) < MAX_BATCH_SIZE or self._key(self._queue[0]) in batch
+        ):
+            item = self._queue.pop(0)
+            key = self._key(item)
+            key = key if key is not None else id(item)
+            if key in batch:
+                # The later put replaces this one; its callbacks still run.
+                callbacks = self._callbacks.pop(id(batch[key]), [])
+                self._callbacks.setdefault(id(item), [])[:0] = callbacks
+            batch[key] = item
+        return list(batch.values())
+
+    def _write_one_by_one(self, items):
+        """Write items singly; returns those that failed transiently."""
+        retry = []
+        for item in items:
+            try:
+                self._write_batch([item])
+                self._written([item])
+            except Exception as exc:
+                if is_transient(exc):
+                    retry.append(item)
+                else:
+                    self._pop_callbacks(item)
+                    self._dead_letter(item, exc)
+        return retry
+
+    def _dead_letter(self, item, exc):
+        self.dead_letters += 1
+        logger.error("Dropping item rejected by %s: %s", self.table_name, exc)
+        record = {"table": self.table_name, "error": str(exc), "item": item, "at": time.time()}
+        try:
+            with open(DEAD_LETTER_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+        except OSError:
+            logger.exception("Could not write to %s", DEAD_LETTER_PATH)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=self.flush_interval * 2)
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._queue) < MAX_BATCH_SIZE:
+                    self._cond.wait(self.flush_interval)
+                if self._closed:
+                    return
+            self.flush()
+
+    def _write_batch(self, items):
+        requests = {
+            self.table_name: [{"PutRequest": {"Item": item}} for item in items]
+        }
+        for attempt in range(self.max_retries + 1):
+            response = get_dynamodb().batch_write_item(RequestItems=requests)
+            requests = response.get("UnprocessedItems") or {}
+            if not requests:
+                return
+            delay = self.base_delay * 2**attempt
+            time.sleep(delay + random.uniform(0, delay))
+        raise UnprocessedItemsError(
+            f"{len(requests.get(self.table_name, []))} items still unprocessed "
+            f"after {self.max_retries} retries"
+        )
+
+
+_buffers = {}
+_buffers_lock = threading.Lock()
+
+
+def get_write_buffer(table_name="wellness-app") -> WriteBuffer:
+    buffer = _buffers.get(table_name)
+    if buffer is None:
+        with _buffers_lock:
+            buffer = _buffers.get(table_name)
+            if buffer is None:
+                buffer = WriteBuffer(table_name)
+                _buffers[table_name] = buffer
+    return buffer
+
+
+@atexit.register
+def flush_all():
+    for buffer in list(_buffers.values()):
+        buffer.close()
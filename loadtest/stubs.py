@@ -0,0 +1,168 @@
+"""
+Local stand-ins for Bedrock and DynamoDB used by the load test.
+
+Bedrock is replaced by ``StubBedrock``, which answers each prompt type the app
+sends with a well-formed response after a configurable delay. DynamoDB is moto,
+unless ``AWS_ENDPOINT_URL_DYNAMODB`` points at DynamoDB Local.
+"""
+
+import io
+import json
+import os
+import random
+import time
+
+from features import aws_clients
+from features.diet_tracking import DATE_INDEX
+from features.history import MEAL_PLAN_TABLE
+from features.nutrition import AGGREGATES_TABLE
+
+# Simulated model latency: a fixed time to first token plus a delay per token.
+FIRST_TOKEN_SECONDS = float(os.getenv("STUB_BEDROCK_LATENCY", "0.4"))
+TOKEN_SECONDS = float(os.getenv("STUB_BEDROCK_TOKEN_DELAY", "0.002"))
+CHUNK_TOKENS = 8
+
+_MEALS = ["Breakfast", "Lunch", "Dinner", "Snack"]
+
+
+def _meal(kind):
+    return {
+        "meal": kind,
+        "name": f"{kind.lower()} bowl",
+        "portion": "1 bowl",
+        "calories": random.randint(150, 700),
+        "protein_g": random.randint(5, 45),
+        "carbs_g": random.randint(10, 80),
+        "fat_g": random.randint(3, 30),
+    }
+
+
+def _day(number):
+    return {"day": number, "meals": [_meal(kind) for kind in _MEALS]}
+
+
+def stub_answer(prompt: str) -> str:
+    """A plausible answer for each kind of prompt the app sends."""
+    if "Create a 7-day meal plan" in prompt:
+        return json.dumps({"days": [_day(n) for n in range(1, 8)]})
+    if '"days"' in prompt and "**Day " in prompt:
+        number = int(prompt.split("**Day ", 1)[1].split("**", 1)[0])
+        return json.dumps(_day(number))
+    if "Estimate the nutrition" in prompt:
+        return json.dumps(_meal("Meal"))
+    if '"ingredients"' in prompt:
+        return json.dumps({"ingredients": ["spinach", "egg", "greek yogurt"]})
+    words = " ".join(random.choice(["oats", "berries", "chicken", "rice", "salad"]) for _ in range(250))
+    return "**Breakfast**: " + words
+
+
+def _prompt_text(body: dict) -> str:
+    content = body["messages"][0]["content"]
+    return next(block["text"] for block in content if block.get("type") == "text")
+
+
+class StubBedrock:
+    """Drop-in for the ``bedrock-runtime`` client methods the app calls."""
+
+    def _answer(self, body):
+        body = json.loads(body)
+        text = stub_answer(_prompt_text(body))
+        words = text.split(" ")
+        usage = {"input_tokens": len(json.dumps(body)) // 4, "output_tokens": len(words)}
+        return text, words, usage
+
+    def invoke_model(self, body, **kwargs):
+        text, words, usage = self._answer(body)
+        time.sleep(FIRST_TOKEN_SECONDS + TOKEN_SECONDS * len(words))
+        payload = {"content": [{"type": "text", "text": text}], "usage": usage}
+        return {"body": io.BytesIO(json.dumps(payload).encode("utf-8"))}
+
+    def invoke_model_with_response_stream(self, body, **kwargs):
+        text, words, usage = self._answer(body)
+        time.sleep(FIRST_TOKEN_SECONDS)
+        return {"body": self._events(words, usage)}
+
+    def _events(self, words, usage):
+        def event(data):
+            return {"chunk": {"bytes": json.dumps(data).encode("utf-8")}}
+
+        yield event({"type": "message_start", "message": {"usage": usage}})
+        for start in range(0, len(words), CHUNK_TOKENS):
+            chunk = words[start : start + CHUNK_TOKENS]
+            time.sleep(TOKEN_SECONDS * len(chunk))
+            text = " ".join(chunk) + (" " if start + CHUNK_TOKENS < len(words) else "")
+            yield event(
+                {"type": "content_block_delta", "delta": {"type": "text_delta", "text": text}}
+            )
+        yield event({"type": "message_delta", "usage": {"output_tokens": usage["output_tokens"]}})
+
+
+def _create_table(dynamodb, name, keys, attributes, indexes=None):
+    create = {
+        "TableName": name,
+        "KeySchema": keys,
+        "AttributeDefinitions": attributes,
+        "BillingMode": "PAY_PER_REQUEST",
+    }
+    if indexes:
+        create["GlobalSecondaryIndexes"] = indexes
+    try:
+        dynamodb.create_table(**create)
+    except dynamodb.meta.client.exceptions.ResourceInUseException:
+        pass
+
+
+def create_tables():
+    dynamodb = aws_clients.get_dynamodb()
+    user_id = {"AttributeName": "user_id", "AttributeType": "S"}
+    # One item per diet log plus the profile (log_id "profile") under each user,
+    # so log reads and batch writes see the item counts a real user produces.
+    _create_table(
+        dynamodb,
+        "wellness-app",
+        [
+            {"AttributeName": "user_id", "KeyType": "HASH"},
+            {"AttributeName": "log_id", "KeyType": "RANGE"},
+        ],
+        [
+            user_id,
+            {"AttributeName": "log_id", "AttributeType": "S"},
+            {"AttributeName": "date_time", "AttributeType": "S"},
+        ],
+        [
+            {
+                "IndexName": DATE_INDEX,
+                "KeySchema": [
+                    {"AttributeName": "user_id", "KeyType": "HASH"},
+                    {"AttributeName": "date_time", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+            }
+        ],
+    )
+    for name, sort_key in ((MEAL_PLAN_TABLE, "created_at"), (AGGREGATES_TABLE, "period")):
+        _create_table(
+            dynamodb,
+            name,
+            [
+                {"AttributeName": "user_id", "KeyType": "HASH"},
+                {"AttributeName": sort_key, "KeyType": "RANGE"},
+            ],
+            [user_id, {"AttributeName": sort_key, "AttributeType": "S"}],
+        )
+
+
+def start_local_backends():
+    """Point the app's AWS clients at the stubs. Returns the moto mock, if any."""
+    mock = None
+    if not os.getenv("AWS_ENDPOINT_URL_DYNAMODB"):
+        from moto import mock_aws
+
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+        os.environ.setdefault("AWS_REGION", "us-east-1")
+        mock = mock_aws()
+        mock.start()
+    aws_clients.override("bedrock-runtime", client=StubBedrock())
+    create_tables()
+    return mock
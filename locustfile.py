@@ -1,11 +1,226 @@
-from locust import HttpUser, task, between
+"""
+Load test for the app's user flows.
 
+Each simulated user saves a profile, then generates 1-day and 7-day plans, logs
+meals, views their logs and asks for a daily summary. The flows call the same
+feature functions the Streamlit pages use, in-process, against a stub Bedrock
+and moto (or DynamoDB Local via AWS_ENDPOINT_URL_DYNAMODB), so the numbers
+cover our code, DynamoDB round trips and LLM handling rather than the network.
 
-class WellnessUser(HttpUser):
-    wait_time = between(1, 5)  # Wait between 1 and 5 seconds between tasks
+    locust --headless -u 50 -r 10 -t 2m [--budgets loadtest/budgets.json]
 
-    @task
-    def visit_homepage(self):
-        self.client.get(
-            "/"
-        )  # Equivalent to visiting http://wellness-app-tursunai.online:8501/
+At the end a per-step p50/p95/p99 and throughput table is printed, and the run
+exits non-zero if any budget in the budgets file is exceeded.
+"""
+
+import datetime
+import json
+import random
+import time
+from contextlib import contextmanager
+
+from locust import User, between, events, task
+
+from loadtest.stubs import start_local_backends
+
+start_local_backends()
+
+from features.diet_tracking import (  # noqa: E402
+    fetch_diet_logs,
+    get_logs_by_date,
+    save_diet_entry,
+)
+from features.dynamo import save_profile_to_dynamodb  # noqa: E402
+from features.history import save_meal_plan  # noqa: E402
+from features.llm_claude import PRIORITY_BATCH, stream_claude  # noqa: E402
+from features.nutrition import (  # noqa: E402
+    cached_commentary,
+    commentary_prompt,
+    day_period,
+    get_totals,
+    save_commentary,
+    week_period,
+)
+from features.profile_context import get_profile_context  # noqa: E402
+from features.weekly_plan import generate_week_plan  # noqa: E402
+
+PERCENTILES = (0.5, 0.95, 0.99)
+
+MEALS = [
+    "two eggs, toast and a coffee with milk",
+    "chicken salad with olive oil dressing",
+    "salmon, rice and broccoli",
+    "greek yogurt with berries",
+    "lentil soup and bread",
+]
+INGREDIENT_NOTES = [
+    "",
+    "\nAvailable ingredients: spinach, eggs, greek yogurt\n",
+    "\nAvailable ingredients: chicken breast, rice, broccoli\n",
+]
+
+
+@events.init_command_line_parser.add_listener
+def _add_arguments(parser):
+    parser.add_argument(
+        "--budgets",
+        default="loadtest/budgets.json",
+        help="JSON file with per-step latency budgets (ms) and max_fail_ratio",
+    )
+
+
+def _random_profile():
+    return {
+        "age": random.randint(18, 80),
+        "gender": random.choice(["Male", "Female"]),
+        "height": random.randint(150, 200),
+        "weight": random.randint(45, 130),
+        "body_fat": random.randint(10, 40),
+        "activity_level": random.choice(["Sedentary", "Moderately active", "Very active"]),
+        "allergies": random.choice(["", "Peanuts", "Dairy"]),
+        "diet_type": random.choice(["Omnivore", "Vegetarian"]),
+        "cooking_equipment": "Stove, Oven",
+        "goal": random.choice(["Lose weight", "Gain muscle", "Maintain weight"]),
+        "goal_details": "",
+    }
+
+
+class WellnessUser(User):
+    wait_time = between(1, 5)
+
+    @contextmanager
+    def step(self, name):
+        """Report the wrapped block to Locust as one request named ``name``."""
+        started = time.perf_counter()
+        exception = None
+        try:
+            yield
+        except Exception as error:
+            exception = error
+        events.request.fire(
+            request_type="flow",
+            name=name,
+            response_time=(time.perf_counter() - started) * 1000,
+            response_length=0,
+            exception=exception,
+            context={},
+        )
+
+    def on_start(self):
+        self.profile = _random_profile()
+        with self.step("save profile"):
+            self.context = get_profile_context(self.profile)
+            profile = dict(
+                self.profile,
+                bmi=self.context.bmi,
+                bmr=self.context.bmr,
+                tdee=self.context.tdee,
+            )
+            self.user_id = save_profile_to_dynamodb(profile)
+
+    def _fire_first_token(self, timings):
+        events.request.fire(
+            request_type="flow",
+            name="1-day plan (first token)",
+            response_time=timings["time_to_first_token"] * 1000,
+            response_length=0,
+            exception=None,
+            context={},
+        )
+
+    @task(3)
+    def day_plan(self):
+        timings = {}
+        with self.step("1-day plan"):
+            prompt = self.context.day_plan_prompt(random.choice(INGREDIENT_NOTES))
+            plan = "".join(stream_claude(prompt, timings=timings))
+            save_meal_plan(self.user_id, plan, "1 Day")
+        if timings:
+            self._fire_first_token(timings)
+
+    @task(1)
+    def week_plan(self):
+        with self.step("7-day plan"):
+            days, stats = generate_week_plan(self.context, random.choice(INGREDIENT_NOTES))
+            save_meal_plan(self.user_id, json.dumps(days), "7 Days")
+
+    @task(5)
+    def log_meal(self):
+        with self.step("log meal"):
+            save_diet_entry(
+                self.user_id,
+                str(datetime.date.today()),
+                datetime.datetime.now().strftime("%I:%M %p"),
+                "Text",
+                random.choice(MEALS),
+            )
+
+    @task(4)
+    def view_logs(self):
+        today = datetime.date.today()
+        with self.step("view logs"):
+            get_logs_by_date(
+                self.user_id, str(today - datetime.timedelta(days=30)), str(today)
+            )
+        with self.step("nutrition totals"):
+            get_totals(self.user_id, day_period(str(today)))
+            get_totals(self.user_id, week_period(str(today)))
+
+    @task(2)
+    def summarize(self):
+        today = str(datetime.date.today())
+        with self.step("summarize day"):
+            totals = get_totals(self.user_id, day_period(today))
+            if totals and not cached_commentary(totals):
+                logs = fetch_diet_logs(self.user_id, today, today)
+                prompt = commentary_prompt(today, logs, totals)
+                text = "".join(stream_claude(prompt, priority=PRIORITY_BATCH))
+                save_commentary(self.user_id, today, text, totals["entry_count"])
+
+
+def _check_budgets(environment, budgets):
+    violations = []
+    total = environment.stats.total
+    if total.num_requests and total.fail_ratio > budgets.get("max_fail_ratio", 0):
+        violations.append(
+            f"fail ratio {total.fail_ratio:.2%} > {budgets['max_fail_ratio']:.2%}"
+        )
+    for name, limits in budgets.get("steps", {}).items():
+        entry = environment.stats.entries.get((name, "flow"))
+        if entry is None or not entry.num_requests:
+            continue
+        for key, limit in limits.items():
+            actual = entry.get_response_time_percentile(int(key[1:]) / 100)
+            if actual > limit:
+                violations.append(f"{name} {key} {actual:.0f} ms > {limit} ms")
+    return violations
+
+
+def _print_report(environment):
+    header = f"{'step':<26}{'reqs':>7}{'fails':>7}{'req/s':>8}" + "".join(
+        f"{'p' + str(int(p * 100)):>8}" for p in PERCENTILES
+    )
+    print("\n" + header)
+    print("-" * len(header))
+    for (name, _), entry in sorted(environment.stats.entries.items()):
+        print(
+            f"{name:<26}{entry.num_requests:>7}{entry.num_failures:>7}"
+            f"{entry.total_rps:>8.2f}"
+            + "".join(
+                f"{entry.get_response_time_percentile(p):>8.0f}" for p in PERCENTILES
+            )
+        )
+
+
+@events.quitting.add_listener
+def _enforce_budgets(environment, **kwargs):
+    _print_report(environment)
+    with open(environment.parsed_options.budgets) as f:
+        budgets = json.load(f)
+    violations = _check_budgets(environment, budgets)
+    for violation in violations:
+        print(f"❌ Budget exceeded: {violation}")
+    if violations:
+        environment.process_exit_code = 1
+    else:
+        print("✅ All latency budgets met")
@@ -0,0 +1,103 @@
+"""
+One-off migration for the diet log date index.
+
+Creates the ``user_id``/``date_time`` GSI on the wellness-app table if it is
+missing, then adds the ``date_time`` sort key to diet log items written before
+it existed. Safe to re-run: items that already have the key are skipped.
+
+    python scripts/backfill_diet_log_index.py [--dry-run]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from boto3.dynamodb.conditions import Attr
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from features.aws_clients import get_table  # noqa: E402
+from features.diet_tracking import DATE_INDEX, make_date_time_key  # noqa: E402
+
+table = get_table()
+
+
+def ensure_index():
+    description = table.meta.client.describe_table(TableName=table.name)["Table"]
+    indexes = description.get("GlobalSecondaryIndexes", [])
+    if any(index["IndexName"] == DATE_INDEX for index in indexes):
+        print(f"✅ Index {DATE_INDEX} already exists")
+        return
+
+    create = {
+        "IndexName": DATE_INDEX,
+        "KeySchema": [
+            {"AttributeName": "user_id", "KeyType": "HASH"},
+            {"AttributeName": "date_time", "KeyType": "RANGE"},
+        ],
+        "Projection": {"ProjectionType": "ALL"},
+    }
+    billing = description.get("BillingModeSummary", {}).get("BillingMode")
+    if billing != "PAY_PER_REQUEST":
+        throughput = description["ProvisionedThroughput"]
+        create["ProvisionedThroughput"] = {
+            "ReadCapacityUnits": throughput["ReadCapacityUnits"],
+            "WriteCapacityUnits": throughput["WriteCapacityUnits"],
+        }
+
+    print(f"⏳ Creating index {DATE_INDEX}...")
+    table.meta.client.update_table(
+        TableName=table.name,
+        AttributeDefinitions=[
+            {"AttributeName": "user_id", "AttributeType": "S"},
+            {"AttributeName": "date_time", "AttributeType": "S"},
+        ],
+        GlobalSecondaryIndexUpdates=[{"Create": create}],
+    )
+
+
+def backfill(dry_run=False):
+    key_names = [key["AttributeName"] for key in table.key_schema]
+    scan = {
+        "FilterExpression": Attr("log_id").exists()
+        & Attr("date").exists()
+        & Attr("date_time").not_exists()
+    }
+    updated = 0
+    while True:
+        response = table.scan(**scan)
+        for item in response.get("Items", []):
+            date_time = make_date_time_key(item["date"], item.get("time", ""))
+            if not dry_run:
+                table.update_item(
+                    Key={name: item[name] for name in key_names},
+                    UpdateExpression="SET date_time = :dt",
+                    ExpressionAttributeValues={":dt": date_time},
+                )
+            updated += 1
+        last_key = response.get("LastEvaluatedKey")
+        if not last_key:
+            break
+        scan["ExclusiveStartKey"] = last_key
+        # Stay well inside the table's capacity while walking it.
+        time.sleep(0.1)
+
+    verb = "Would update" if dry_run else "Updated"
+    print(f"✅ {verb} {updated} diet log items")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--dry-run", action="store_true", help="count items without writing"
+    )
+    args = parser.parse_args()
+
+    if not args.dry_run:
+        ensure_index()
+    backfill(dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Rebuild the day/week nutrition totals from the diet log items.
+
+Days logged before the aggregates table existed have no totals, and totals
+can drift if an update was lost. This recomputes every day and week item from
+the logs and overwrites its counts and macros (stored commentary is kept).
+Logs saved without macros are estimated first (local food table, then
+Claude) and the estimate is stored on the log item, unless --no-estimate.
+
+Safe to re-run. Meals logged while it runs may be missed from the rebuilt
+totals; run it again, or at a quiet time.
+
+    python scripts/backfill_nutrition_aggregates.py [--dry-run] [--no-estimate]
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+
+from boto3.dynamodb.conditions import Attr
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from features.aws_clients import get_table  # noqa: E402
+from features.dynamo import convert_floats_to_decimal  # noqa: E402
+from features.nutrition import (  # noqa: E402
+    AGGREGATES_TABLE,
+    MACROS,
+    day_period,
+    extract_macros,
+    week_period,
+)
+
+table = get_table()
+
+
+def log_items():
+    scan = {"FilterExpression": Attr("log_id").exists() & Attr("date").exists()}
+    while True:
+        response = table.scan(**scan)
+        yield from response.get("Items", [])
+        last_key = response.get("LastEvaluatedKey")
+        if not last_key:
+            return
+        scan["ExclusiveStartKey"] = last_key
+        # Stay well inside the table's capacity while walking it.
+        time.sleep(0.1)
+
+
+def stored_macros(item):
+    if all(name in item for name in MACROS):
+        return {name: float(item[name]) for name in MACROS}
+    return {}
+
+
+def estimate(item):
+    """Estimate and store macros for a log saved without them."""
+    macros = extract_macros(item.get("food", ""), use_food_db=item.get("meal") != "Image")
+    if macros:
+        key_names = [key["AttributeName"] for key in table.key_schema]
+        values = convert_floats_to_decimal(macros)
+        table.update_item(
+            Key={name: item[name] for name in key_names},
+            UpdateExpression="SET " + ", ".join(f"{name} = :{name}" for name in MACROS),
+            ExpressionAttributeValues={f":{name}": values[name] for name in MACROS},
+        )
+    return macros
+
+
+def backfill(dry_run=False, estimate_missing=True):
+    totals = defaultdict(lambda: {"entry_ids": set(), "unestimated": 0, **{m: 0.0 for m in MACROS}})
+    logs = missing = estimated = 0
+    for item in log_items():
+        logs += 1
+        macros = stored_macros(item)
+        missing += not macros
+        if not macros and estimate_missing and not dry_run:
+            macros = estimate(item)
+            estimated += bool(macros)
+        for period in (day_period(item["date"]), week_period(item["date"])):
+            period_totals = totals[(item["user_id"], period)]
+            period_totals["entry_ids"].add(item["log_id"])
+            if macros:
+                for name in MACROS:
+                    period_totals[name] += macros[name]
+            else:
+                period_totals["unestimated"] += 1
+
+    if not dry_run:
+        aggregates = get_table(AGGREGATES_TABLE)
+        for (user_id, period), period_totals in totals.items():
+            sums = convert_floats_to_decimal({name: round(period_totals[name], 1) for name in MACROS})
+            values = {f":{name}": sums[name] for name in MACROS}
+            values[":count"] = len(period_totals["entry_ids"])
+            values[":unestimated"] = period_totals["unestimated"]
+            values[":ids"] = period_totals["entry_ids"]
+            aggregates.update_item(
+                Key={"user_id": user_id, "period": period},
+                UpdateExpression="SET "
+                + ", ".join(f"{name} = :{name}" for name in MACROS)
+                + ", entry_count = :count, unestimated = :unestimated, entry_ids = :ids",
+                ExpressionAttributeValues=values,
+            )
+
+    verb = "Would write" if dry_run else "Wrote"
+    print(f"✅ Read {logs} diet logs, {missing} without macros, estimated {estimated}")
+    print(f"✅ {verb} {len(totals)} day/week totals")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dry-run", action="store_true", help="compute without writing")
+    parser.add_argument(
+        "--no-estimate",
+        action="store_true",
+        help="count logs without macros as unestimated instead of estimating them",
+    )
+    args = parser.parse_args()
+    backfill(dry_run=args.dry_run, estimate_missing=not args.no_estimate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Export diet logs to the Parquet archive used for long-term analytics.
+
+Appends logs newer than the last export, partitioned by user and month, to
+DIET_ARCHIVE_PATH (or --root). Without --user every user is exported with a
+scan of the date index.
+
+    python scripts/export_diet_history.py [--user USER_ID] [--root PATH] [--full]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from features.diet_export import ARCHIVE_PATH, export_diet_history  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--user", help="export one user's logs (default: all users)")
+    parser.add_argument("--root", default=ARCHIVE_PATH, help="archive directory or s3:// URI")
+    parser.add_argument(
+        "--full", action="store_true", help="delete and rebuild the archive (or the user's part)"
+    )
+    args = parser.parse_args()
+
+    who = f"user {args.user}" if args.user else "all users"
+    print(f"⏳ Exporting diet logs for {who} to {args.root}...")
+    exporter = export_diet_history(args.user, root=args.root, full=args.full)
+    print(f"✅ Exported {exporter.rows_written} logs in {exporter.files_written} files")
+    if exporter.rows_skipped:
+        print(f"⚠️ Skipped {exporter.rows_skipped} logs with a bad date or macros (see the log)")
+
+
+if __name__ == "__main__":
+    main()